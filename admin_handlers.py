@@ -1,484 +1,635 @@
 import logging
 import asyncio
+import functools
+import re
+import time
 from telegram import Update
 from telegram.ext import ContextTypes
-from telegram.error import TelegramError
+from telegram.error import Forbidden, TelegramError
 
 from database import Database
 from keyboards import admin_keyboard, admin_back_keyboard
-from config import ADMIN_ID, ADMIN_MESSAGES
+from config import ADMIN_ID, ADMIN_IDS, ADMIN_MESSAGES, MAX_CONTENT_LENGTH
 from utils import parse_admin_command, is_valid_channel_username, MessageTemplates
 
+logger = logging.getLogger(__name__)
+
+# Keyboards are immutable singletons (see keyboards.py); bind them once
+# so handlers skip the call per update
+_ADMIN_KB = admin_keyboard()
+_BACK_KB = admin_back_keyboard()
+
+# Maximum concurrent broadcast sends (Telegram's global limit is ~30 msg/s)
+BROADCAST_CONCURRENCY = 30
+
+# Users fetched from the database per broadcast page
+BROADCAST_PAGE_SIZE = 500
+
+# Admin user lookups are cached briefly to skip repeat DB round-trips
+USER_CACHE_TTL = 60
+USER_CACHE_MAX = 5000
+
+# Rendered stats/orders dashboard messages are cached briefly so admins
+# clicking refresh rapidly do not re-run the aggregate queries
+RENDERED_CACHE_TTL = 10
+
+# Special-content inserts queue up and flush in batches so a burst of
+# /addcontent commands costs one commit per batch, not one per row
+CONTENT_FLUSH_BATCH = 64
+CONTENT_FLUSH_SECONDS = 0.05
+
+# Static admin prompt texts, built once at import instead of per click
+PROMPTS = {
+    'codes': "🎟️ إدارة أكواد الهدايا\n\n💡 لإنشاء كود جديد:\n/makecode الكود النقاط الحد_الأقصى\n\nمثال:\n/makecode GIFT100 100 50",
+    'broadcast': "📣 بث رسالة جماعية\n\n💡 لبث رسالة لجميع المستخدمين:\n/broadcast النص\n\nمثال:\n/broadcast مرحباً بكم جميعاً في البوت!",
+    'add_channel': "➕ إضافة قناة جديدة\n\n💡 الأمر:\n/addchannel @اسم_القناة نوع هدف\n\nالأنواع المتاحة:\n• normal - قناة عادية (3 نقاط)\n• vip - قناة VIP (4 نقاط)\n\nمثال:\n/addchannel @mychannel vip 1000",
+    'remove_channel': "➖ حذف قناة\n\n💡 الأمر:\n/removechannel @اسم_القناة\n\nمثال:\n/removechannel @mychannel",
+    'add_points': "💰 إضافة نقاط\n\n💡 الأمر:\n/addpoints معرف_المستخدم النقاط\n\nمثال:\n/addpoints 123456789 100",
+    'remove_points': "🚫 خصم نقاط\n\n💡 الأمر:\n/removepoints معرف_المستخدم النقاط\n\nمثال:\n/removepoints 123456789 50",
+    'ban_user': "🔨 حظر مستخدم\n\n💡 الأمر:\n/ban @اسم_المستخدم\n\nمثال:\n/ban @baduser",
+    'unban_user': "✅ إلغاء حظر مستخدم\n\n💡 الأمر:\n/unban @اسم_المستخدم\n\nمثال:\n/unban @gooduser",
+    'add_mandatory': "➕ إضافة قناة إجبارية\n\n💡 الأمر:\n/addmandatory @اسم_القناة [عنوان_اختياري]\n\nمثال:\n/addmandatory @mychannel قناة التحديثات",
+    'remove_mandatory': "➖ حذف قناة إجبارية\n\n💡 الأمر:\n/removemandatory @اسم_القناة\n\nمثال:\n/removemandatory @mychannel",
+    'user_info': "🔍 البحث عن معلومات المستخدم\n\n💡 الأمر:\n/userinfo @اسم_المستخدم\n\nمثال:\n/userinfo @john123",
+}
+
+# One compiled pass validates and captures '@channel type target'
+_CHANNEL_ARGS_RE = re.compile(r'@?(\w{4,32})\s+(normal|vip)\s+(\d+)\s*\Z', re.IGNORECASE)
+
+# Fast precheck for '@username' / numeric-id arguments
+_USER_IDENT_RE = re.compile(r'(?:@\w{4,32}|\d+)\Z')
+
+# Fixed tail of the special-content list view
+_LIST_FOOTER = "📝 لإضافة محتوى جديد:\n/addcontent العنوان | النص"
+
+# Usage-error texts, like PROMPTS: static, so built once at import
+USAGE = {
+    'add_points': "❌ الاستخدام الصحيح:\n/addpoints @username points\nأو\n/addpoints user_id points\n\nمثال: /addpoints @user123 100",
+    'remove_points': "❌ الاستخدام الصحيح:\n/removepoints @username points\nأو\n/removepoints user_id points\n\nمثال: /removepoints @user123 50",
+    'add_channel': "❌ الاستخدام الصحيح:\n/addchannel @channel type target\n\nالأنواع المتاحة: normal, vip\nمثال: /addchannel @mychannel vip 1000",
+    'remove_channel': "❌ الاستخدام الصحيح:\n/removechannel @channel\n\nمثال: /removechannel @mychannel",
+    'make_code': "❌ الاستخدام الصحيح:\n/makecode code points limit\n\nمثال: /makecode GIFT100 100 50",
+    'broadcast': "❌ الاستخدام الصحيح:\n/broadcast message\n\nمثال: /broadcast مرحباً بكم جميعاً!",
+    'ban': "❌ الاستخدام الصحيح:\n/ban @username\n\nمثال: /ban @baduser",
+    'unban': "❌ الاستخدام الصحيح:\n/unban @username\n\nمثال: /unban @gooduser",
+    'add_mandatory': "❌ الاستخدام الصحيح:\n/addmandatory @channel [title]\n\nمثال: /addmandatory @mychannel قناة التحديثات",
+    'remove_mandatory': "❌ الاستخدام الصحيح:\n/removemandatory @channel\n\nمثال: /removemandatory @mychannel",
+    'user_info': "❌ الاستخدام الصحيح:\n/userinfo @username\n\nمثال: /userinfo @john123",
+    'add_content': "❌ الاستخدام الصحيح:\n/addcontent العنوان | النص\n\nمثال:\n/addcontent رسالة ترحيب | مرحباً بك في المحتوى الخاص!",
+}
+
+def _norm_channel(s: str) -> str:
+    """Strip a leading @ from a channel/username argument"""
+    return s.lstrip('@')
+
+@functools.lru_cache(maxsize=256)
+def _format_success(title: str, content: str) -> str:
+    """Success reply for /addcontent; memoized since admins repeat pastes"""
+    preview = content if len(content) <= 100 else f"{content[:99]}…"
+    return f"✅ تم إضافة المحتوى الخاص بنجاح!\n\n📝 العنوان: {title}\n💭 النص: {preview}"
+
+def _parse_add_channel(text: str):
+    """Parse '@channel type target', returning (username, type, target, error)"""
+    m = _CHANNEL_ARGS_RE.match(text)
+    if m:
+        return m.group(1), m.group(2).lower(), int(m.group(3)), None
+
+    # Slow path only runs on bad input, to pick the right error message
+    parts = text.split()
+    if len(parts) != 3:
+        return None, None, None, "❌ تنسيق خاطئ. استخدم: @اسم_القناة نوع هدف"
+    if parts[1].lower() not in ('normal', 'vip'):
+        return None, None, None, "❌ النوع يجب أن يكون: normal أو vip"
+    if not parts[2].isdigit():
+        return None, None, None, "❌ الهدف يجب أن يكون رقم صحيح"
+    # Type and target are fine, so the username is what failed the regex
+    return None, None, None, "❌ اسم القناة غير صحيح"
+
+# Validation is pure and admin inputs repeat, so memoize it
+_is_valid_channel = functools.lru_cache(maxsize=1024)(is_valid_channel_username)
+
+def admin_only(handler):
+    """Silently drop updates from non-admin users before running the handler"""
+    @functools.wraps(handler)
+    async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if update.effective_user.id not in ADMIN_IDS:
+            return
+        return await handler(self, update, context)
+    return wrapper
+
 class AdminHandlers:
     def __init__(self, database: Database):
         self.db = database
-    
+        self._user_cache = {}  # cache key -> (timestamp, user row)
+        self._rendered_cache = {}  # cache key -> (timestamp, rendered message)
+        self._content_queue = asyncio.Queue()  # pending (title, message) rows
+        self._content_flusher = None  # started lazily once a loop is running
+
+        # Callback data -> handler, replacing a long if/elif chain with
+        # a single dict lookup. All handlers take (query, context).
+        self._callback_handlers = {
+            "admin_menu": self._handle_admin_menu,
+            "admin_stats": self._handle_admin_stats,
+            "admin_orders": self._handle_admin_orders,
+            "admin_users": self._handle_admin_users,
+            "admin_channels": self._handle_admin_channels,
+            "admin_codes": functools.partial(self._prompt, key='codes'),
+            "admin_broadcast": functools.partial(self._prompt, key='broadcast'),
+            "admin_add_normal_channel": functools.partial(self._prompt, key='add_channel', action='add_channel'),
+            "admin_add_vip_channel": functools.partial(self._prompt, key='add_channel', action='add_channel'),
+            "admin_remove_channel": functools.partial(self._prompt, key='remove_channel', action='remove_channel'),
+            "admin_add_points": functools.partial(self._prompt, key='add_points', action='add_points'),
+            "admin_remove_points": functools.partial(self._prompt, key='remove_points', action='remove_points'),
+            "admin_ban_user": functools.partial(self._prompt, key='ban_user'),
+            "admin_unban_user": functools.partial(self._prompt, key='unban_user'),
+            "admin_mandatory_channels": self._handle_admin_mandatory_channels,
+            "admin_add_mandatory": functools.partial(self._prompt, key='add_mandatory'),
+            "admin_remove_mandatory": functools.partial(self._prompt, key='remove_mandatory'),
+            "admin_user_info": functools.partial(self._prompt, key='user_info'),
+        }
+
+        # Pending text action -> parser, replacing the if/elif chain in
+        # handle_admin_text
+        self._text_handlers = {
+            'add_channel': self._apply_add_channel,
+            'remove_channel': self._apply_remove_channel,
+            'add_points': functools.partial(self._apply_points_text, sign=1),
+            'remove_points': functools.partial(self._apply_points_text, sign=-1),
+        }
+
     def is_admin(self, user_id: int) -> bool:
         """Check if user is admin"""
-        return user_id == ADMIN_ID
-    
+        return user_id in ADMIN_IDS
+
+    def _cache_get(self, key):
+        entry = self._user_cache.get(key)
+        if entry and time.monotonic() - entry[0] < USER_CACHE_TTL:
+            return entry[1]
+        return None
+
+    def _cache_put(self, key, value):
+        if len(self._user_cache) >= USER_CACHE_MAX:
+            self._user_cache.clear()
+        self._user_cache[key] = (time.monotonic(), value)
+
+    def _get_user_cached(self, user_id: int):
+        """Get user by ID through a short-lived cache"""
+        key = ('id', user_id)
+        user_data = self._cache_get(key)
+        if user_data is None:
+            user_data = self.db.get_user(user_id)
+            if user_data:
+                self._cache_put(key, user_data)
+        return user_data
+
+    def _get_user_by_username_cached(self, username: str):
+        """Get user by username through a short-lived cache"""
+        key = ('username', username.replace('@', '').lower())
+        user_data = self._cache_get(key)
+        if user_data is None:
+            user_data = self.db.get_user_by_username(username)
+            if user_data:
+                self._cache_put(key, user_data)
+        return user_data
+
+    def _invalidate_user_cache(self, user_id: int = None, username: str = None):
+        """Drop cached entries after a write that changes the user row"""
+        if user_id is not None:
+            self._user_cache.pop(('id', user_id), None)
+        if username is not None:
+            self._user_cache.pop(('username', username.replace('@', '').lower()), None)
+    
+    async def _get_stats_message(self) -> str:
+        """Render the stats dashboard, reusing a recent render if available"""
+        entry = self._rendered_cache.get('stats')
+        if entry and time.monotonic() - entry[0] < RENDERED_CACHE_TTL:
+            return entry[1]
+
+        # Query + render off the event loop so a slow render never stalls
+        # other updates
+        stats = await asyncio.to_thread(self.db.get_stats)
+        message = await asyncio.to_thread(MessageTemplates.admin_stats, stats)
+        self._rendered_cache['stats'] = (time.monotonic(), message)
+        return message
+
+    async def _get_orders_message(self, status: str = None) -> str:
+        """Render the orders list, reusing a recent render if available"""
+        key = ('orders', status)
+        entry = self._rendered_cache.get(key)
+        if entry and time.monotonic() - entry[0] < RENDERED_CACHE_TTL:
+            return entry[1]
+
+        # A large order list can take tens of milliseconds to format
+        orders = await asyncio.to_thread(self.db.get_orders, status=status)
+        message = await asyncio.to_thread(MessageTemplates.order_list, orders)
+        self._rendered_cache[key] = (time.monotonic(), message)
+        return message
+
+    def _invalidate_rendered_cache(self):
+        """Drop cached dashboard renders after a write that changes them"""
+        self._rendered_cache.clear()
+
+    def _resolve_user(self, identifier: str):
+        """Resolve an @username or numeric ID to (user_id, display_name, error).
+
+        Exactly one of (user_id, display_name) / error is set.
+        """
+        if identifier.startswith('@'):
+            user_data = self._get_user_by_username_cached(identifier)
+            if not user_data:
+                return None, None, f"❌ المستخدم {identifier} غير موجود"
+            return user_data['id'], f"@{user_data['username']}", None
+
+        try:
+            user_id = int(identifier)
+        except ValueError:
+            return None, None, "❌ يجب استخدام @username أو رقم المستخدم"
+
+        user_data = self._get_user_cached(user_id)
+        if not user_data:
+            return None, None, f"❌ المستخدم {identifier} غير موجود"
+
+        display_name = f"@{user_data['username']}" if user_data.get('username') else str(user_id)
+        return user_id, display_name, None
+
+    @admin_only
     async def admin_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show admin menu"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
         message = "👑 لوحة التحكم الإدارية\n\nاختر العملية المطلوبة:"
         
         if update.message:
-            await update.message.reply_text(message, reply_markup=admin_keyboard())
+            await update.message.reply_text(message, reply_markup=_ADMIN_KB)
         else:
-            await update.callback_query.edit_message_text(message, reply_markup=admin_keyboard())
+            await update.callback_query.edit_message_text(message, reply_markup=_ADMIN_KB)
     
+    @admin_only
     async def add_points(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Add points to user - Command: /addpoints @username/user_id points"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
         args = context.args
         if len(args) != 2:
-            await update.message.reply_text(
-                "❌ الاستخدام الصحيح:\n/addpoints @username points\nأو\n/addpoints user_id points\n\nمثال: /addpoints @user123 100"
-            )
+            await update.message.reply_text(USAGE['add_points'])
             return
         
         user_identifier = args[0]
+        if not _USER_IDENT_RE.match(user_identifier):
+            await update.message.reply_text("❌ يجب استخدام @username أو رقم المستخدم")
+            return
         try:
             points = int(args[1])
         except ValueError:
             await update.message.reply_text("❌ يجب أن تكون النقاط رقم صحيح")
             return
         
-        # Check if it's username or user_id
-        if user_identifier.startswith('@'):
-            user_data = self.db.get_user_by_username(user_identifier)
-            if user_data:
-                user_id = user_data['id']
-                display_name = f"@{user_data['username']}"
-            else:
-                await update.message.reply_text(f"❌ المستخدم {user_identifier} غير موجود")
-                return
-        else:
-            try:
-                user_id = int(user_identifier)
-                user_data = self.db.get_user(user_id)
-                if user_data:
-                    display_name = f"@{user_data['username']}" if user_data.get('username') else str(user_id)
-                else:
-                    await update.message.reply_text(f"❌ المستخدم {user_identifier} غير موجود")
-                    return
-            except ValueError:
-                await update.message.reply_text("❌ يجب استخدام @username أو رقم المستخدم")
-                return
+        user_id, display_name, error = self._resolve_user(user_identifier)
+        if error:
+            await update.message.reply_text(error)
+            return
         
         if self.db.update_user_points(user_id, points):
+            self._invalidate_user_cache(user_id, user_identifier if user_identifier.startswith('@') else None)
+            self._invalidate_rendered_cache()
             message = f"✅ تم إضافة {points} نقطة للمستخدم {display_name}"
         else:
             message = "❌ حدث خطأ في إضافة النقاط"
         
         await update.message.reply_text(message)
     
+    @admin_only
     async def remove_points(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Remove points from user - Command: /removepoints @username/user_id points"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
         args = context.args
         if len(args) != 2:
-            await update.message.reply_text(
-                "❌ الاستخدام الصحيح:\n/removepoints @username points\nأو\n/removepoints user_id points\n\nمثال: /removepoints @user123 50"
-            )
+            await update.message.reply_text(USAGE['remove_points'])
             return
         
         user_identifier = args[0]
+        if not _USER_IDENT_RE.match(user_identifier):
+            await update.message.reply_text("❌ يجب استخدام @username أو رقم المستخدم")
+            return
         try:
             points = int(args[1])
         except ValueError:
             await update.message.reply_text("❌ يجب أن تكون النقاط رقم صحيح")
             return
         
-        # Check if it's username or user_id
-        if user_identifier.startswith('@'):
-            user_data = self.db.get_user_by_username(user_identifier)
-            if user_data:
-                user_id = user_data['id']
-                display_name = f"@{user_data['username']}"
-            else:
-                await update.message.reply_text(f"❌ المستخدم {user_identifier} غير موجود")
-                return
-        else:
-            try:
-                user_id = int(user_identifier)
-                user_data = self.db.get_user(user_id)
-                if user_data:
-                    display_name = f"@{user_data['username']}" if user_data.get('username') else str(user_id)
-                else:
-                    await update.message.reply_text(f"❌ المستخدم {user_identifier} غير موجود")
-                    return
-            except ValueError:
-                await update.message.reply_text("❌ يجب استخدام @username أو رقم المستخدم")
-                return
+        user_id, display_name, error = self._resolve_user(user_identifier)
+        if error:
+            await update.message.reply_text(error)
+            return
         
         if self.db.update_user_points(user_id, -points):
+            self._invalidate_user_cache(user_id, user_identifier if user_identifier.startswith('@') else None)
+            self._invalidate_rendered_cache()
             message = f"✅ تم خصم {points} نقطة من المستخدم {display_name}"
         else:
             message = "❌ حدث خطأ في خصم النقاط"
         
         await update.message.reply_text(message)
     
+    @admin_only
     async def add_channel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Add channel - Command: /addchannel @channel type target"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
         args = context.args
         if len(args) != 3:
-            await update.message.reply_text(
-                "❌ الاستخدام الصحيح:\n/addchannel @channel type target\n\n"
-                "الأنواع المتاحة: normal, vip\n"
-                "مثال: /addchannel @mychannel vip 1000"
-            )
+            await update.message.reply_text(USAGE['add_channel'])
             return
         
-        channel_username = args[0].replace('@', '')
-        channel_type = args[1].lower()
-        
-        if channel_type not in ['normal', 'vip']:
-            await update.message.reply_text("❌ النوع يجب أن يكون: normal أو vip")
+        channel_username, channel_type, target, error = _parse_add_channel(' '.join(args))
+        if error:
+            await update.message.reply_text(error)
             return
         
-        try:
-            target = int(args[2])
-        except ValueError:
-            await update.message.reply_text("❌ الهدف يجب أن يكون رقم صحيح")
-            return
-        
-        if not is_valid_channel_username(channel_username):
+        if not _is_valid_channel(channel_username):
             await update.message.reply_text("❌ اسم القناة غير صحيح")
             return
         
         # Admin commands are free - no payment required
         price = 0  # Free for admin
         
-        # Create order first (free for admin)
-        order_id = self.db.create_order(update.effective_user.id, channel_username, price, target)
+        # Order + channel are written in one transaction
+        order_id, ok = self.db.create_channel_with_order(update.effective_user.id, channel_username, channel_type, target, price)
         
-        if order_id and self.db.add_channel(channel_username, channel_type, target, order_id):
+        if ok:
+            self._invalidate_rendered_cache()
             message = f"✅ تم تفعيل القناة @{channel_username}\n📊 النوع: {channel_type}\n🎯 الهدف: {target} عضو\n💰 السعر: {price} نقطة\n🆔 رقم الطلب: {order_id}"
         else:
             message = "❌ حدث خطأ في إضافة القناة"
         
         await update.message.reply_text(message)
     
+    @admin_only
     async def remove_channel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Remove channel - Command: /removechannel @channel"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
         args = context.args
         if len(args) != 1:
-            await update.message.reply_text(
-                "❌ الاستخدام الصحيح:\n/removechannel @channel\n\nمثال: /removechannel @mychannel"
-            )
+            await update.message.reply_text(USAGE['remove_channel'])
             return
         
-        channel_username = args[0].replace('@', '')
+        channel_username = _norm_channel(args[0])
         
         if self.db.remove_channel(channel_username):
+            self._invalidate_rendered_cache()
             message = ADMIN_MESSAGES['channel_removed'].format(channel=channel_username)
         else:
             message = "❌ القناة غير موجودة"
         
         await update.message.reply_text(message)
     
+    @admin_only
     async def make_code(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Create redemption code - Command: /makecode code points limit"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
         args = context.args
         if len(args) != 3:
-            await update.message.reply_text(
-                "❌ الاستخدام الصحيح:\n/makecode code points limit\n\n"
-                "مثال: /makecode GIFT100 100 50"
-            )
+            await update.message.reply_text(USAGE['make_code'])
             return
         
-        code = args[0]
-        
+        # Comma-separated codes create a batch in one transaction:
+        # /makecode GIFT1,GIFT2,GIFT3 100 50
+        codes = [c for c in args[0].split(',') if c]
+        if not codes:
+            await update.message.reply_text(USAGE['make_code'])
+            return
+
         try:
             points = int(args[1])
             limit = int(args[2])
         except ValueError:
             await update.message.reply_text("❌ النقاط والحد الأقصى يجب أن يكونا أرقام صحيحة")
             return
-        
-        if self.db.create_code(code, points, limit):
-            message = ADMIN_MESSAGES['code_created'].format(code=code, points=points, limit=limit)
+
+        if len(codes) > 1:
+            created = self.db.create_codes_bulk([(code, points, limit) for code in codes])
+            if created:
+                message = f"🎟️ تم إنشاء {created} كود\nالنقاط: {points}\nالحد الأقصى: {limit}"
+            else:
+                message = "❌ الأكواد موجودة مسبقاً"
+        elif self.db.create_code(codes[0], points, limit):
+            message = ADMIN_MESSAGES['code_created'].format(code=codes[0], points=points, limit=limit)
         else:
             message = "❌ الكود موجود مسبقاً"
-        
+
         await update.message.reply_text(message)
     
+    @admin_only
     async def view_orders(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """View orders - Command: /orders [status]"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
         status = context.args[0] if context.args else None
-        orders = self.db.get_orders(status=status)
-        
-        message = MessageTemplates.order_list(orders)
+        message = await self._get_orders_message(status)
         await update.message.reply_text(message)
     
+    @admin_only
     async def view_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """View bot statistics - Command: /stats"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
-        stats = self.db.get_stats()
-        message = MessageTemplates.admin_stats(stats)
+        message = await self._get_stats_message()
         await update.message.reply_text(message)
     
+    @admin_only
     async def broadcast(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Broadcast message to all users - Command: /broadcast message"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
         if not context.args:
-            await update.message.reply_text(
-                "❌ الاستخدام الصحيح:\n/broadcast message\n\nمثال: /broadcast مرحباً بكم جميعاً!"
-            )
+            await update.message.reply_text(USAGE['broadcast'])
             return
         
         message = ' '.join(context.args)
-        users = self.db.get_all_users()
-        
-        await update.message.reply_text(f"📡 بدء البث لـ {len(users)} مستخدم...")
-        
+        total_users = self.db.count_users()
+
+        status_message = await update.message.reply_text(f"📡 بدء البث لـ {total_users} مستخدم...")
+
+        # Upload the payload once, then fan out by reference: copy_message
+        # sends a chat/message id pair per user instead of re-sending the
+        # full text (or any future media) N times.
+        source = await context.bot.send_message(chat_id=ADMIN_ID, text=message)
+
+        # Send concurrently with a bounded number of requests in flight.
+        # Each sender holds its semaphore slot for ~1 second after sending,
+        # which keeps the overall rate around BROADCAST_CONCURRENCY msg/s
+        # (Telegram allows ~30 messages per second globally).
+        semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+
+        # Bind the hot names once; the closure then resolves them as fast
+        # locals instead of going through module/attribute lookups per user
+        copy = context.bot.copy_message
+        source_chat_id = source.chat_id
+        source_message_id = source.message_id
+        forbidden = Forbidden
+        telegram_error = TelegramError
+        sleep = asyncio.sleep
+
+        async def send_one(user_id):
+            async with semaphore:
+                try:
+                    await copy(chat_id=user_id, from_chat_id=source_chat_id, message_id=source_message_id)
+                    return user_id, True
+                except forbidden:
+                    return user_id, None  # User blocked the bot - remember it
+                except telegram_error:
+                    return user_id, False  # Deleted account or other send error
+                finally:
+                    await sleep(1)
+
+        # Stream users in pages so very large user sets never sit in memory,
+        # and record users who blocked the bot with one UPDATE per page.
         success_count = 0
-        for user_id in users:
-            try:
-                await context.bot.send_message(chat_id=user_id, text=message)
-                success_count += 1
-                
-                # Small delay to avoid rate limiting
-                if success_count % 20 == 0:
-                    await asyncio.sleep(1)
-                    
-            except TelegramError:
-                continue  # User blocked bot or deleted account
-        
-        await update.message.reply_text(f"✅ تم البث بنجاح لـ {success_count} من أصل {len(users)} مستخدم")
+        completed = 0
+        for page in self.db.iter_users(page_size=BROADCAST_PAGE_SIZE):
+            results = await asyncio.gather(*[send_one(user_id) for user_id in page])
+
+            success_count += sum(1 for _, ok in results if ok)
+            completed += len(page)
+
+            blocked_ids = [user_id for user_id, ok in results if ok is None]
+            if blocked_ids:
+                self.db.mark_users_blocked(blocked_ids)
+
+            if completed < total_users:
+                try:
+                    await status_message.edit_text(f"📡 جاري البث... {completed}/{total_users}")
+                except TelegramError:
+                    pass
+
+        await update.message.reply_text(f"✅ تم البث بنجاح لـ {success_count} من أصل {total_users} مستخدم")
     
+    @admin_only
     async def handle_callback_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle admin callback queries"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
         query = update.callback_query
-        await query.answer()
-        
-        data = query.data
-        
-        if data == "admin_menu":
-            await self.admin_menu(update, context)
-        elif data == "admin_stats":
-            stats = self.db.get_stats()
-            message = MessageTemplates.admin_stats(stats)
-            await query.edit_message_text(message, reply_markup=admin_back_keyboard())
-        elif data == "admin_orders":
-            orders = self.db.get_orders()
-            message = MessageTemplates.order_list(orders)
-            await query.edit_message_text(message, reply_markup=admin_back_keyboard())
-        elif data == "admin_users":
-            await self._handle_admin_users(query, context)
-        elif data == "admin_channels":
-            await self._handle_admin_channels(query, context)
-        elif data == "admin_codes":
-            await self._handle_admin_codes(query, context)
-        elif data == "admin_broadcast":
-            await self._handle_admin_broadcast(query, context)
-        elif data == "admin_add_normal_channel":
-            await self._handle_admin_add_channel_prompt(query, context, 'normal')
-        elif data == "admin_add_vip_channel":
-            await self._handle_admin_add_channel_prompt(query, context, 'vip')
-        elif data == "admin_remove_channel":
-            await self._handle_admin_remove_channel_prompt(query, context)
-        elif data == "admin_add_points":
-            await self._handle_admin_add_points_prompt(query, context)
-        elif data == "admin_remove_points":
-            await self._handle_admin_remove_points_prompt(query, context)
-        elif data == "admin_ban_user":
-            await self._handle_admin_ban_user_prompt(query, context)
-        elif data == "admin_unban_user":
-            await self._handle_admin_unban_user_prompt(query, context)
-        elif data == "admin_mandatory_channels":
-            await self._handle_admin_mandatory_channels(query, context)
-        elif data == "admin_add_mandatory":
-            await self._handle_admin_add_mandatory_prompt(query, context)
-        elif data == "admin_remove_mandatory":
-            await self._handle_admin_remove_mandatory_prompt(query, context)
-        elif data == "admin_user_info":
-            await self._handle_admin_user_info_prompt(query, context)
+        # Ack immediately so the admin's spinner stops while we render
+        asyncio.create_task(query.answer())
+        
+        handler = self._callback_handlers.get(query.data)
+        if handler:
+            await handler(query, context)
+
+    async def _handle_admin_menu(self, query, context):
+        """Show admin menu from a callback"""
+        message = "👑 لوحة التحكم الإدارية\n\nاختر العملية المطلوبة:"
+        await query.edit_message_text(message, reply_markup=_ADMIN_KB)
+
+    async def _handle_admin_stats(self, query, context):
+        """Show bot statistics from a callback"""
+        message = await self._get_stats_message()
+        await query.edit_message_text(message, reply_markup=_BACK_KB)
+
+    async def _handle_admin_orders(self, query, context):
+        """Show orders list from a callback"""
+        message = await self._get_orders_message()
+        await query.edit_message_text(message, reply_markup=_BACK_KB)
+
+    async def _prompt(self, query, context, key, action=None):
+        """Show a canned prompt, optionally arming a pending text action"""
+        await query.edit_message_text(PROMPTS[key], reply_markup=_BACK_KB)
+        if action:
+            context.user_data['awaiting_admin_action'] = action
 
     
     async def _handle_admin_users(self, query, context):
         """Handle admin users management"""
         stats = self.db.get_stats()
         message = f"👥 إدارة المستخدمين\n\nإجمالي المستخدمين: {stats['users']}\n\nاستخدم الأوامر التالية:\n/addpoints معرف_المستخدم النقاط\n/removepoints معرف_المستخدم النقاط"
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
+        await query.edit_message_text(message, reply_markup=_BACK_KB)
     
     async def _handle_admin_channels(self, query, context):
         """Handle admin channels management"""
-        channels = self.db.get_active_channels()
-        
+        # Only fetch the 10 rows we actually show
+        channels = await asyncio.to_thread(self.db.get_active_channels, limit=10)
+
         if not channels:
             message = "📢 لا توجد قنوات نشطة"
         else:
-            message = "📢 القنوات النشطة:\n\n"
-            for channel in channels[:10]:  # Show only first 10
-                status = "🟢" if channel['active'] else "🔴"
-                progress = f"{channel['gained']}/{channel['target']}"
-                message += f"{status} @{channel['username']} - {channel['type']}\nالتقدم: {progress}\n\n"
-        
+            message = "📢 القنوات النشطة:\n\n" + "".join(
+                f"{'🟢' if channel['active'] else '🔴'} @{channel['username']} - {channel['type']}\n"
+                f"التقدم: {channel['gained']}/{channel['target']}\n\n"
+                for channel in channels
+            )
+
         message += "\n💡 الأوامر المتاحة:\n/addchannel @قناة نوع هدف\n/removechannel @قناة"
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
-    
-    async def _handle_admin_codes(self, query, context):
-        """Handle admin codes management"""
-        message = "🎟️ إدارة أكواد الهدايا\n\n💡 لإنشاء كود جديد:\n/makecode الكود النقاط الحد_الأقصى\n\nمثال:\n/makecode GIFT100 100 50"
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
-    
-    async def _handle_admin_broadcast(self, query, context):
-        """Handle admin broadcast"""
-        message = "📣 بث رسالة جماعية\n\n💡 لبث رسالة لجميع المستخدمين:\n/broadcast النص\n\nمثال:\n/broadcast مرحباً بكم جميعاً في البوت!"
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
-    
-    async def _handle_admin_add_channel_prompt(self, query, context, channel_type='normal'):
-        """Prompt admin to add channel"""
-        message = "➕ إضافة قناة جديدة\n\n💡 الأمر:\n/addchannel @اسم_القناة نوع هدف\n\nالأنواع المتاحة:\n• normal - قناة عادية (3 نقاط)\n• vip - قناة VIP (4 نقاط)\n\nمثال:\n/addchannel @mychannel vip 1000"
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
-        
-        context.user_data['awaiting_admin_action'] = 'add_channel'
-    
-    async def _handle_admin_remove_channel_prompt(self, query, context):
-        """Prompt admin to remove channel"""
-        message = "➖ حذف قناة\n\n💡 الأمر:\n/removechannel @اسم_القناة\n\nمثال:\n/removechannel @mychannel"
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
-        
-        context.user_data['awaiting_admin_action'] = 'remove_channel'
-    
-    async def _handle_admin_add_points_prompt(self, query, context):
-        """Prompt admin to add points"""
-        message = "💰 إضافة نقاط\n\n💡 الأمر:\n/addpoints معرف_المستخدم النقاط\n\nمثال:\n/addpoints 123456789 100"
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
-        
-        context.user_data['awaiting_admin_action'] = 'add_points'
-    
-    async def _handle_admin_remove_points_prompt(self, query, context):
-        """Prompt admin to remove points"""
-        message = "🚫 خصم نقاط\n\n💡 الأمر:\n/removepoints معرف_المستخدم النقاط\n\nمثال:\n/removepoints 123456789 50"
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
-        
-        context.user_data['awaiting_admin_action'] = 'remove_points'
+        await query.edit_message_text(message, reply_markup=_BACK_KB)
     
     async def handle_admin_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle admin text messages when expecting admin input"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
+        # Cheapest check first: most messages carry no pending action
         action = context.user_data.get('awaiting_admin_action')
         if not action:
             return
         
+        if update.effective_user.id not in ADMIN_IDS:
+            return
+        
         # Clear the waiting state
         context.user_data.pop('awaiting_admin_action', None)
         
-        text = update.message.text.strip()
+        handler = self._text_handlers.get(action)
+        if handler:
+            await handler(update, update.message.text.strip())
+    
+    async def _apply_add_channel(self, update: Update, text: str):
+        """Parse and apply a pending add-channel text command"""
+        channel_username, channel_type, target, error = _parse_add_channel(text)
+        if error:
+            await update.message.reply_text(error)
+            return
         
-        if action == 'add_channel':
-            # Parse add channel command
-            parts = text.split()
-            if len(parts) != 3:
-                await update.message.reply_text("❌ تنسيق خاطئ. استخدم: @اسم_القناة نوع هدف")
-                return
-            
-            channel_username = parts[0].replace('@', '')
-            channel_type = parts[1].lower()
-            
-            if channel_type not in ['normal', 'vip']:
-                await update.message.reply_text("❌ النوع يجب أن يكون: normal أو vip")
-                return
-            
-            try:
-                target = int(parts[2])
-            except ValueError:
-                await update.message.reply_text("❌ الهدف يجب أن يكون رقم صحيح")
-                return
-            
-            # Admin commands are free - no payment required
-            price = 0  # Free for admin
-            
-            # Create order first (free for admin)
-            order_id = self.db.create_order(update.effective_user.id, channel_username, price, target)
-            
-            if order_id and self.db.add_channel(channel_username, channel_type, target, order_id):
-                message = f"✅ تم إضافة القناة @{channel_username} من نوع {channel_type}\nالهدف: {target} عضو\n💰 السعر: {price} نقطة\n🆔 رقم الطلب: {order_id}"
-            else:
-                message = "❌ القناة موجودة مسبقاً أو حدث خطأ"
-            
-            await update.message.reply_text(message)
+        # Admin commands are free - no payment required
+        price = 0  # Free for admin
         
-        elif action == 'remove_channel':
-            # Parse remove channel command
-            channel_username = text.replace('@', '')
-            
-            if self.db.remove_channel(channel_username):
-                message = f"✅ تم حذف القناة @{channel_username}"
-            else:
-                message = "❌ القناة غير موجودة"
-            
-            await update.message.reply_text(message)
+        # Order + channel are written in one transaction
+        order_id, ok = self.db.create_channel_with_order(update.effective_user.id, channel_username, channel_type, target, price)
         
-        elif action in ['add_points', 'remove_points']:
-            # Parse points command
-            parts = text.split()
-            if len(parts) != 2:
-                await update.message.reply_text("❌ تنسيق خاطئ. استخدم: معرف_المستخدم النقاط")
-                return
-            
-            try:
-                user_id = int(parts[0])
-                points = int(parts[1])
-            except ValueError:
-                await update.message.reply_text("❌ يجب أن يكون معرف المستخدم والنقاط أرقام صحيحة")
-                return
-            
-            if action == 'remove_points':
-                points = -points
-            
-            if self.db.update_user_points(user_id, points):
-                action_text = "إضافة" if points > 0 else "خصم"
-                message = f"✅ تم {action_text} {abs(points)} نقطة للمستخدم {user_id}"
-            else:
-                message = "❌ المستخدم غير موجود"
-            
-            await update.message.reply_text(message)
+        if ok:
+            self._invalidate_rendered_cache()
+            message = f"✅ تم إضافة القناة @{channel_username} من نوع {channel_type}\nالهدف: {target} عضو\n💰 السعر: {price} نقطة\n🆔 رقم الطلب: {order_id}"
+        else:
+            message = "❌ القناة موجودة مسبقاً أو حدث خطأ"
+        
+        await update.message.reply_text(message)
     
-    async def ban_user(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Ban user by username - Command: /ban @username"""
-        if not self.is_admin(update.effective_user.id):
+    async def _apply_remove_channel(self, update: Update, text: str):
+        """Parse and apply a pending remove-channel text command"""
+        channel_username = _norm_channel(text)
+        
+        if self.db.remove_channel(channel_username):
+            self._invalidate_rendered_cache()
+            message = f"✅ تم حذف القناة @{channel_username}"
+        else:
+            message = "❌ القناة غير موجودة"
+        
+        await update.message.reply_text(message)
+    
+    async def _apply_points_text(self, update: Update, text: str, sign: int = 1):
+        """Parse and apply a pending add/remove points text command"""
+        parts = text.split()
+        if len(parts) != 2:
+            await update.message.reply_text("❌ تنسيق خاطئ. استخدم: معرف_المستخدم النقاط")
             return
         
+        try:
+            user_id = int(parts[0])
+            points = sign * int(parts[1])
+        except ValueError:
+            await update.message.reply_text("❌ يجب أن يكون معرف المستخدم والنقاط أرقام صحيحة")
+            return
+        
+        if self.db.update_user_points(user_id, points):
+            self._invalidate_user_cache(user_id)
+            action_text = "إضافة" if points > 0 else "خصم"
+            message = f"✅ تم {action_text} {abs(points)} نقطة للمستخدم {user_id}"
+        else:
+            message = "❌ المستخدم غير موجود"
+        
+        await update.message.reply_text(message)
+    
+    @admin_only
+    async def ban_user(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Ban user by username - Command: /ban @username"""
         args = context.args
         if not args:
-            await update.message.reply_text("❌ الاستخدام الصحيح:\n/ban @username\n\nمثال: /ban @baduser")
+            await update.message.reply_text(USAGE['ban'])
             return
         
-        username = args[0].replace('@', '')
+        username = _norm_channel(args[0])
         
         # Get user ID by username (if user exists in database)
-        user_data = self.db.get_user_by_username(username)
+        user_data = self._get_user_by_username_cached(username)
         if not user_data:
             await update.message.reply_text(f"❌ المستخدم @{username} غير موجود في قاعدة البيانات")
             return
@@ -486,26 +637,25 @@ class AdminHandlers:
         user_id = user_data['id']
         
         if self.db.ban_user(user_id, f"Banned by admin via username @{username}"):
+            self._invalidate_user_cache(user_id, username)
             message = f"🔨 تم حظر المستخدم @{username} (ID: {user_id}) بنجاح"
         else:
             message = "❌ حدث خطأ في حظر المستخدم"
         
         await update.message.reply_text(message)
     
+    @admin_only
     async def unban_user(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Unban user by username - Command: /unban @username"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
         args = context.args
         if not args:
-            await update.message.reply_text("❌ الاستخدام الصحيح:\n/unban @username\n\nمثال: /unban @gooduser")
+            await update.message.reply_text(USAGE['unban'])
             return
         
-        username = args[0].replace('@', '')
+        username = _norm_channel(args[0])
         
         # Get user ID by username (if user exists in database)
-        user_data = self.db.get_user_by_username(username)
+        user_data = self._get_user_by_username_cached(username)
         if not user_data:
             await update.message.reply_text(f"❌ المستخدم @{username} غير موجود في قاعدة البيانات")
             return
@@ -513,23 +663,22 @@ class AdminHandlers:
         user_id = user_data['id']
         
         if self.db.unban_user(user_id):
+            self._invalidate_user_cache(user_id, username)
             message = f"✅ تم إلغاء حظر المستخدم @{username} (ID: {user_id}) بنجاح"
         else:
             message = "❌ حدث خطأ في إلغاء حظر المستخدم"
         
         await update.message.reply_text(message)
     
+    @admin_only
     async def add_mandatory_channel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Add mandatory channel - Command: /addmandatory @channel [title]"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
         args = context.args
         if not args:
-            await update.message.reply_text("❌ الاستخدام الصحيح:\n/addmandatory @channel [title]\n\nمثال: /addmandatory @mychannel قناة التحديثات")
+            await update.message.reply_text(USAGE['add_mandatory'])
             return
         
-        channel_username = args[0].replace('@', '')
+        channel_username = _norm_channel(args[0])
         channel_title = ' '.join(args[1:]) if len(args) > 1 else None
         
         if self.db.add_mandatory_channel(channel_username, channel_title):
@@ -541,17 +690,15 @@ class AdminHandlers:
         
         await update.message.reply_text(message)
     
+    @admin_only
     async def remove_mandatory_channel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Remove mandatory channel - Command: /removemandatory @channel"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
         args = context.args
         if not args:
-            await update.message.reply_text("❌ الاستخدام الصحيح:\n/removemandatory @channel\n\nمثال: /removemandatory @mychannel")
+            await update.message.reply_text(USAGE['remove_mandatory'])
             return
         
-        channel_username = args[0].replace('@', '')
+        channel_username = _norm_channel(args[0])
         
         if self.db.remove_mandatory_channel(channel_username):
             message = f"✅ تم حذف القناة @{channel_username} من القنوات الإجبارية"
@@ -560,159 +707,171 @@ class AdminHandlers:
         
         await update.message.reply_text(message)
     
-    async def _handle_admin_ban_user_prompt(self, query, context):
-        """Prompt admin to ban user"""
-        message = "🔨 حظر مستخدم\n\n💡 الأمر:\n/ban @اسم_المستخدم\n\nمثال:\n/ban @baduser"
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
-    
-    async def _handle_admin_unban_user_prompt(self, query, context):
-        """Prompt admin to unban user"""
-        message = "✅ إلغاء حظر مستخدم\n\n💡 الأمر:\n/unban @اسم_المستخدم\n\nمثال:\n/unban @gooduser"
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
-    
     async def _handle_admin_mandatory_channels(self, query, context):
         """Show mandatory channels management"""
-        channels = self.db.get_mandatory_channels()
+        channels = await asyncio.to_thread(self.db.get_mandatory_channels)
         
         if not channels:
             message = "🔒 لا توجد قنوات إجبارية مُضافة\n\n💡 القنوات الإجبارية هي قنوات يجب على جميع المستخدمين الاشتراك فيها قبل استخدام البوت"
         else:
-            message = "🔒 القنوات الإجبارية النشطة:\n\n"
+            parts = ["🔒 القنوات الإجبارية النشطة:\n\n"]
             for channel in channels:
-                message += f"📢 @{channel['channel_username']}\n"
+                parts.append(f"📢 @{channel['channel_username']}\n")
                 if channel['channel_title']:
-                    message += f"📝 {channel['channel_title']}\n"
-                message += f"📅 أُضيفت: {channel['added_at'][:10]}\n\n"
+                    parts.append(f"📝 {channel['channel_title']}\n")
+                parts.append(f"📅 أُضيفت: {channel['added_at'][:10]}\n\n")
+            message = "".join(parts)
         
         message += "\n💡 استخدم الأزرار لإضافة أو حذف قنوات إجبارية"
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
-    
-    async def _handle_admin_add_mandatory_prompt(self, query, context):
-        """Prompt admin to add mandatory channel"""
-        message = "➕ إضافة قناة إجبارية\n\n💡 الأمر:\n/addmandatory @اسم_القناة [عنوان_اختياري]\n\nمثال:\n/addmandatory @mychannel قناة التحديثات"
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
-    
-    async def _handle_admin_remove_mandatory_prompt(self, query, context):
-        """Prompt admin to remove mandatory channel"""
-        message = "➖ حذف قناة إجبارية\n\n💡 الأمر:\n/removemandatory @اسم_القناة\n\nمثال:\n/removemandatory @mychannel"
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
-    
-    async def _handle_admin_user_info_prompt(self, query, context):
-        """Prompt admin to search for user info"""
-        message = "🔍 البحث عن معلومات المستخدم\n\n💡 الأمر:\n/userinfo @اسم_المستخدم\n\nمثال:\n/userinfo @john123"
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
+        await query.edit_message_text(message, reply_markup=_BACK_KB)
     
+    @admin_only
     async def get_user_info(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Get user info by username - Command: /userinfo @username"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
         args = context.args
         if not args:
-            await update.message.reply_text("❌ الاستخدام الصحيح:\n/userinfo @username\n\nمثال: /userinfo @john123")
+            await update.message.reply_text(USAGE['user_info'])
             return
         
-        username = args[0].replace('@', '')
+        username = _norm_channel(args[0])
         
-        # Search for user by username
-        user_info = self.db.get_user_by_username(username)
+        # Single query fetches the user row, ban details and subscriptions
+        user_info = await asyncio.to_thread(self.db.get_user_full_profile, username)
         
         if not user_info:
             await update.message.reply_text(f"❌ لم يتم العثور على مستخدم بالاسم @{username}")
             return
         
-        # Get user subscriptions
-        subscriptions = self.db.get_user_subscriptions(user_info['id'])
+        subscriptions = user_info['subscriptions']
         subscription_count = len(subscriptions)
         
-        # Check if user is banned
-        is_banned = self.db.is_user_banned(user_info['id'])
         ban_info = ""
-        if is_banned:
-            ban_data = self.db.get_ban_info(user_info['id'])
-            ban_info = f"\n🚫 المستخدم محظور\n📝 سبب الحظر: {ban_data.get('reason', 'غير محدد')}"
-        
-        # Format message
-        message = f"👤 معلومات المستخدم @{username}\n\n"
-        message += f"🆔 ID: {user_info['id']}\n"
-        message += f"👤 الاسم: {user_info['first_name']}\n"
+        if user_info.get('is_banned'):
+            ban_info = f"\n🚫 المستخدم محظور\n📝 سبب الحظر: {user_info.get('banned_reason') or 'غير محدد'}"
+        
+        # Collect lines and join once instead of repeated concatenation
+        lines = [
+            f"👤 معلومات المستخدم @{username}",
+            "",
+            f"🆔 ID: {user_info['id']}",
+            f"👤 الاسم: {user_info['first_name']}",
+        ]
         if user_info.get('username'):
-            message += f"📱 المعرف: @{user_info['username']}\n"
-        message += f"💰 النقاط: {user_info['points']}\n"
-        message += f"📊 الاشتراكات النشطة: {subscription_count}\n"
+            lines.append(f"📱 المعرف: @{user_info['username']}")
+        lines.append(f"💰 النقاط: {user_info['points']}")
+        lines.append(f"📊 الاشتراكات النشطة: {subscription_count}")
         if user_info.get('referred_by'):
-            message += f"👥 تم دعوته بواسطة: {user_info['referred_by']}\n"
-        message += f"📅 تاريخ التسجيل: {user_info['joined_at'][:10]}\n"
-        message += ban_info
+            lines.append(f"👥 تم دعوته بواسطة: {user_info['referred_by']}")
+        lines.append(f"📅 تاريخ التسجيل: {user_info['joined_at'][:10]}")
+        if ban_info:
+            lines.append(ban_info)
         
         # Show subscriptions if any
         if subscriptions:
-            message += f"\n📢 القنوات المشترك بها:\n"
-            for sub in subscriptions:
-                message += f"• @{sub}\n"
+            lines.append("\n📢 القنوات المشترك بها:")
+            lines.extend(f"• @{sub}" for sub in subscriptions)
         
-        await update.message.reply_text(message)
+        await update.message.reply_text("\n".join(lines))
     
     async def _handle_admin_special_content(self, query, context):
         """Handle special content management"""
-        special_content = self.db.get_special_content()
+        special_content = await asyncio.to_thread(self.db.get_special_content)
         
         if not special_content:
-            message = "💬 إدارة المحتوى الخاص\n\n❌ لا يوجد محتوى خاص مُضاف\n\n"
-            message += "💡 المحتوى الخاص يُعرض فقط للمستخدمين الذين:\n"
-            message += "• لم يشتركوا في أي قناة\n"
-            message += "• أو اشتركوا ثم غادروا القنوات (مع خصم 5 نقاط)\n\n"
-            message += "📝 لإضافة محتوى خاص جديد:\n"
-            message += "/addcontent العنوان | النص\n\n"
-            message += "مثال:\n/addcontent رسالة ترحيب | مرحباً بك في المحتوى الخاص"
+            message = ("💬 إدارة المحتوى الخاص\n\n❌ لا يوجد محتوى خاص مُضاف\n\n"
+                       "💡 المحتوى الخاص يُعرض فقط للمستخدمين الذين:\n"
+                       "• لم يشتركوا في أي قناة\n"
+                       "• أو اشتركوا ثم غادروا القنوات (مع خصم 5 نقاط)\n\n"
+                       "📝 لإضافة محتوى خاص جديد:\n"
+                       "/addcontent العنوان | النص\n\n"
+                       "مثال:\n/addcontent رسالة ترحيب | مرحباً بك في المحتوى الخاص")
         else:
-            message = "💬 إدارة المحتوى الخاص\n\n"
-            message += f"📊 إجمالي المحتوى: {len(special_content)}\n\n"
+            parts = ["💬 إدارة المحتوى الخاص\n\n",
+                     f"📊 إجمالي المحتوى: {len(special_content)}\n\n"]
             
             for i, content in enumerate(special_content[:5], 1):  # Show first 5
-                message += f"📝 {i}. **{content['content_title']}**\n"
                 content_preview = content['content_message'][:50] + "..." if len(content['content_message']) > 50 else content['content_message']
-                message += f"💭 {content_preview}\n"
-                message += f"📅 {content['created_at'][:10]}\n\n"
+                parts.append(f"📝 {i}. **{content['content_title']}**\n"
+                             f"💭 {content_preview}\n"
+                             f"📅 {content['created_at'][:10]}\n\n")
             
             if len(special_content) > 5:
-                message += f"💡 و {len(special_content) - 5} محتوى إضافي...\n\n"
+                parts.append(f"💡 و {len(special_content) - 5} محتوى إضافي...\n\n")
             
-            message += "📝 لإضافة محتوى جديد:\n/addcontent العنوان | النص"
+            parts.append(_LIST_FOOTER)
+            message = "".join(parts)
         
-        await query.edit_message_text(message, reply_markup=admin_back_keyboard())
+        await query.edit_message_text(message, reply_markup=_BACK_KB)
     
+    @admin_only
     async def add_special_content(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Add special content - Command: /addcontent title | content"""
-        if not self.is_admin(update.effective_user.id):
-            return
-        
-        args = ' '.join(context.args) if context.args else ''
-        if not args or '|' not in args:
-            await update.message.reply_text(
-                "❌ الاستخدام الصحيح:\n/addcontent العنوان | النص\n\n"
-                "مثال:\n/addcontent رسالة ترحيب | مرحباً بك في المحتوى الخاص!"
-            )
+        # Bound the work before any parsing: a huge paste should fail fast
+        if update.message.text and len(update.message.text) > MAX_CONTENT_LENGTH:
+            await update.message.reply_text("❌ النص طويل جداً")
+            return
+        
+        args = context.args or []
+        # Locate the separator token in one pass instead of joining the
+        # whole message only to split it again; partition splits the token
+        # and reports absence in the same C-level call
+        for i, token in enumerate(args):
+            head, sep, tail = token.partition('|')
+            if sep:
+                break
+        else:
+            await update.message.reply_text(USAGE['add_content'])
             return
         
         try:
-            title, content = args.split('|', 1)
-            title = title.strip()
-            content = content.strip()
+            title = ' '.join(args[:i] + [head]).strip()
+            content = ' '.join([tail] + args[i + 1:]).strip()
             
             if not title or not content:
                 await update.message.reply_text("❌ يجب ملء العنوان والنص")
                 return
             
-            success = self.db.add_special_content(title, content)
+            # Queue the row and reply optimistically; the flusher batches
+            # bursts of adds into a single transaction
+            if self._content_flusher is None or self._content_flusher.done():
+                self._content_flusher = asyncio.create_task(self._flush_content_queue(context.bot))
+            await self._content_queue.put((title, content))
             
-            if success:
-                message = f"✅ تم إضافة المحتوى الخاص بنجاح!\n\n📝 العنوان: {title}\n💭 النص: {content[:100]}{'...' if len(content) > 100 else ''}"
-            else:
-                message = "❌ حدث خطأ في إضافة المحتوى الخاص"
-            
-            await update.message.reply_text(message)
+            await update.message.reply_text(_format_success(title, content))
             
-        except Exception as e:
-            logging.error(f"Error adding special content: {e}")
+        except Exception:
+            logger.exception("Error adding special content")
             await update.message.reply_text("❌ حدث خطأ في معالجة الأمر")
+    
+    async def _flush_content_queue(self, bot):
+        """Drain queued special-content rows and insert them in batches"""
+        while True:
+            rows = [await self._content_queue.get()]
+            
+            # Brief window to coalesce a burst into one transaction
+            deadline = time.monotonic() + CONTENT_FLUSH_SECONDS
+            while len(rows) < CONTENT_FLUSH_BATCH:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    rows.append(await asyncio.wait_for(self._content_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # An insert failure must not kill the flusher: the queue would
+            # keep filling while the optimistic replies promise success
+            try:
+                inserted = await asyncio.to_thread(self.db.add_special_content_many, rows)
+            except Exception:
+                logger.exception("Special content flush failed for %s rows", len(rows))
+                inserted = 0
+            if inserted != len(rows):
+                logger.error("Special content flush wrote %s/%s rows", inserted, len(rows))
+                try:
+                    await bot.send_message(
+                        chat_id=ADMIN_ID,
+                        text=f"⚠️ فشل حفظ {len(rows) - inserted} من المحتوى الخاص، يرجى إعادة الإضافة"
+                    )
+                except Exception as e:
+                    logger.error("Failed to notify admin of content flush failure: %s", e)
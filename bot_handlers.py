@@ -1,4 +1,7 @@
+import asyncio
 import logging
+import secrets
+import time
 from telegram import Update, Bot
 from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler, MessageHandler, filters
 from telegram.error import TelegramError
@@ -9,11 +12,131 @@ from config import *
 from utils import *
 from user_verification import check_user_legitimacy
 
+# Mandatory channels change rarely but are read on every /start
+MANDATORY_CHANNELS_TTL = 30
+
+# User rows are re-read several times per interaction; a few seconds of
+# staleness is fine for display values like the points balance
+USER_CACHE_TTL = 5
+USER_CACHE_MAX = 10000
+
+# Messages whose placeholders are config constants render once at import;
+# the rest keep a bound .format so the template string is not re-fetched
+# from the dict on every send
+DAILY_REWARD_MESSAGE = MESSAGES['daily_reward_claimed'].format(points=DAILY_REWARD_POINTS)
+_format_referral_link = MESSAGES['referral_link'].format
+_format_insufficient_points = MESSAGES['insufficient_points'].format
+_format_code_redeemed = MESSAGES['code_redeemed'].format
+
+# Verification-failure texts, composed once instead of per attempt
+VERIFICATION_BLOCKED_MESSAGE = (
+    "❌ فشل التحقق بعد 3 محاولات\n\n"
+    "تم رفض دخولك للبوت لأسباب أمنية.\n"
+    "يمكنك المحاولة مرة أخرى لاحقاً بالضغط على /start"
+)
+_format_wrong_code = (
+    "❌ الرقم خاطئ!\n\n"
+    "يرجى كتابة الرقم **{expected_code}** بالضبط\n\n"
+    "⚠️ المحاولات المتبقية: {remaining}"
+).format
+_format_not_a_number = (
+    "❌ يجب كتابة الرقم فقط!\n\n"
+    "الرقم المطلوب: **{expected_code}**\n\n"
+    "⚠️ المحاولات المتبقية: {remaining}"
+).format
+
+# SHOP_TIERS is a constant, so the catalog text never changes at runtime
+SHOP_MESSAGE = "🛒 متجر شراء الأعضاء:\n\nاختر الباقة المناسبة لك:\n\n" + "\n".join(
+    f"• {members} عضو = {points} نقطة" for members, points in SHOP_TIERS
+) + "\n"
+
 class BotHandlers:
+    """User-facing handlers.
+
+    Several handlers fan out concurrent Bot API calls (membership probes,
+    owner/referrer notifications), so the application must be built with an
+    enlarged outbound HTTPX pool and a separate getUpdates pool — see the
+    builder setup in main.py.
+    """
+
     def __init__(self, database: Database):
         self.db = database
         self.bot_username = None
+        # Serializes the first get_me so a cold-start burst of users does
+        # not fan out duplicate calls
+        self._bot_username_lock = asyncio.Lock()
+        # Bounds concurrent get_chat_member probes so parallel membership
+        # checks do not exhaust the HTTPX connection pool
+        self._probe_sem = asyncio.Semaphore(20)
+        self._mandatory_cache = None  # (timestamp, channels list)
+        self._user_cache = {}  # user_id -> (timestamp, user row)
+        self._special_render = None  # (content version, body, extra count)
+        # Dispatch tables for handle_callback; every handler takes
+        # (query, user_id, data, context)
+        self._exact_callbacks = {
+            'account': self._handle_account,
+            'daily_reward': self._handle_daily_reward,
+            'referral': self._handle_referral,
+            'channels': self._handle_channels,
+            'vip_channels': self._handle_vip_channels,
+            'refresh_channels': self._handle_refresh_channels,
+            'refresh_vip_channels': self._handle_refresh_vip_channels,
+            'shop': self._handle_shop,
+            'back_to_main': self._handle_back_to_main,
+            'redeem_code': self._handle_redeem_code_prompt,
+        }
+        self._prefix_callbacks = (
+            ('buy_', self._handle_buy),
+            ('join_', self._handle_join_channel),
+            ('confirm_', self._handle_confirmation),
+        )
     
+    def _get_user_cached(self, user_id):
+        """Get a user row through a short-lived cache"""
+        entry = self._user_cache.get(user_id)
+        if entry and time.monotonic() - entry[0] < USER_CACHE_TTL:
+            return entry[1]
+
+        user_data = self.db.get_user(user_id)
+        if user_data:
+            if len(self._user_cache) >= USER_CACHE_MAX:
+                self._user_cache.clear()
+            self._user_cache[user_id] = (time.monotonic(), user_data)
+        return user_data
+
+    def _invalidate_user(self, user_id):
+        """Drop the cached row after a write that changes it"""
+        self._user_cache.pop(user_id, None)
+
+    def _get_mandatory_channels_cached(self):
+        """Mandatory channels behind a short TTL; hit on every /start"""
+        entry = self._mandatory_cache
+        if entry and time.monotonic() - entry[0] < MANDATORY_CHANNELS_TTL:
+            return entry[1]
+
+        channels = self.db.get_mandatory_channels()
+        self._mandatory_cache = (time.monotonic(), channels)
+        return channels
+
+    async def _get_bot_username(self, bot):
+        """Fetch and memoize the bot's username (one get_me per process)"""
+        if not self.bot_username:
+            async with self._bot_username_lock:
+                if not self.bot_username:
+                    bot_info = await bot.get_me()
+                    self.bot_username = bot_info.username
+        return self.bot_username
+
+    def _notify(self, bot, chat_id, text):
+        """Fire-and-forget a notification so it never delays the user reply"""
+        asyncio.create_task(self._safe_send(bot, chat_id, text))
+
+    async def _safe_send(self, bot, chat_id, text):
+        try:
+            await bot.send_message(chat_id=chat_id, text=text)
+        except TelegramError as e:
+            logging.error("Failed to notify %s: %s", chat_id, e)
+
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command with mandatory channels check"""
         user = update.effective_user
@@ -23,7 +146,7 @@ class BotHandlers:
         referred_by = extract_user_id_from_start(update.message.text)
         
         # Check if user is new (not in database)
-        is_new_user = not self.db.get_user(user_id)
+        is_new_user = not self._get_user_cached(user_id)
         
         # Security check for new users only
         if is_new_user:
@@ -43,41 +166,36 @@ class BotHandlers:
         # Award referral points if user was referred and is new
         if user_added and referred_by and referred_by != user.id:
             self.db.update_user_points(referred_by, REFERRAL_POINTS)
-            
-            # Notify referrer
-            try:
-                await context.bot.send_message(
-                    chat_id=referred_by,
-                    text=f"🎉 تم قبول دعوتك!\nحصلت على {REFERRAL_POINTS} نقطة من دعوة @{user.username or user.first_name}"
-                )
-            except TelegramError:
-                pass
-        
+            self._invalidate_user(referred_by)
+
+            # Notify referrer in the background
+            self._notify(
+                context.bot,
+                referred_by,
+                f"🎉 تم قبول دعوتك!\nحصلت على {REFERRAL_POINTS} نقطة من دعوة @{user.username or user.first_name}"
+            )
+
         # Get bot username for referral links
-        if not self.bot_username:
-            bot_info = await context.bot.get_me()
-            self.bot_username = bot_info.username
+        await self._get_bot_username(context.bot)
         
         # Check mandatory channels for all users (including returning ones)
-        mandatory_channels = self.db.get_mandatory_channels()
+        mandatory_channels = self._get_mandatory_channels_cached()
         if mandatory_channels:
-            from utils import check_mandatory_channels_membership
             all_subscribed, missing_channels = await check_mandatory_channels_membership(
                 context.bot, user_id, mandatory_channels
             )
             
             if not all_subscribed:
                 # Show mandatory channels message
-                welcome_msg = "👋 أهلاً وسهلاً!\n\n🔒 للاستمرار، يجب الاشتراك في القنوات التالية:\n\n"
+                lines = ["👋 أهلاً وسهلاً!\n\n🔒 للاستمرار، يجب الاشتراك في القنوات التالية:\n"]
                 for channel in missing_channels:
-                    channel_link = f"https://t.me/{channel['channel_username']}"
-                    welcome_msg += f"📢 @{channel['channel_username']}\n"
+                    lines.append(f"📢 @{channel['channel_username']}")
                     if channel.get('channel_title'):
-                        welcome_msg += f"📝 {channel['channel_title']}\n"
-                    welcome_msg += f"{channel_link}\n\n"
-                welcome_msg += "✅ بعد الاشتراك، اضغط /start مرة أخرى"
-                
-                await update.message.reply_text(welcome_msg)
+                        lines.append(f"📝 {channel['channel_title']}")
+                    lines.append(f"https://t.me/{channel['channel_username']}\n")
+                lines.append("✅ بعد الاشتراك، اضغط /start مرة أخرى")
+
+                await update.message.reply_text("\n".join(lines))
                 return
         
         # Admin notification removed - only send for genuinely new users in _complete_user_registration
@@ -86,7 +204,7 @@ class BotHandlers:
         if is_new_user:
             welcome_text = "🎉 مرحباً بك في بوت تجميع النقاط!\n\n📊 يمكنك كسب النقاط من خلال:\n• الانضمام للقنوات\n• دعوة الأصدقاء\n• المكافآت اليومية\n\n🛒 استخدم النقاط لشراء أعضاء لقناتك"
         else:
-            user_data = self.db.get_user(user_id)
+            user_data = self._get_user_cached(user_id)
             welcome_text = f"👋 أهلاً بعودتك!\n\n💰 رصيدك: {user_data['points']} نقطة"
         
         await update.message.reply_text(
@@ -96,10 +214,8 @@ class BotHandlers:
 
     async def _handle_user_verification(self, update: Update, context: ContextTypes.DEFAULT_TYPE, referred_by=None):
         """Handle new user verification with security check"""
-        import random
-        
-        # Generate random 4-digit number
-        verification_code = random.randint(1000, 9999)
+        # Generate random 4-digit number (CSPRNG so codes cannot be predicted)
+        verification_code = 1000 + secrets.randbelow(9000)
         
         # Store in user context
         context.user_data['verification_code'] = verification_code
@@ -118,7 +234,9 @@ class BotHandlers:
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle all callback queries"""
         query = update.callback_query
-        await query.answer()
+        # Stop the client-side spinner right away; the ack does not need to
+        # complete before we start working on the reply
+        asyncio.create_task(query.answer())
         
         data = query.data
         user_id = query.from_user.id
@@ -131,65 +249,44 @@ class BotHandlers:
         # Ensure user exists in database
         self.db.add_user(user_id, query.from_user.username, query.from_user.first_name)
         
-        if data == "account":
-            await self._handle_account(query, user_id)
-        elif data == "daily_reward":
-            await self._handle_daily_reward(query, user_id)
-        elif data == "referral":
-            await self._handle_referral(query, user_id, context)
-        elif data == "channels":
-            await self._handle_channels(query, context)
-        elif data == "vip_channels":
-            await self._handle_vip_channels(query, context)
-        elif data == "refresh_channels":
-            await self._handle_refresh_channels(query, context)
-        elif data == "refresh_vip_channels":
-            await self._handle_refresh_vip_channels(query, context)
-        elif data == "shop":
-            await self._handle_shop(query)
-        elif data.startswith("buy_"):
-            await self._handle_buy(query, user_id, data, context)
-        elif data.startswith("join_"):
-            await self._handle_join_channel(query, user_id, data, context)
-        elif data.startswith("confirm_"):
-            await self._handle_confirmation(query, user_id, data, context)
-        elif data == "back_to_main":
-            await self._handle_back_to_main(query)
-        elif data == "redeem_code":
-            await self._handle_redeem_code_prompt(query, context)
+        handler = self._exact_callbacks.get(data)
+        if handler is None:
+            for prefix, prefix_handler in self._prefix_callbacks:
+                if data.startswith(prefix):
+                    handler = prefix_handler
+                    break
+
+        if handler:
+            await handler(query, user_id, data, context)
 
     
-    async def _handle_account(self, query, user_id):
+    async def _handle_account(self, query, user_id, data=None, context=None):
         """Handle account information request"""
-        user_data = self.db.get_user(user_id)
+        user_data = self._get_user_cached(user_id)
         if user_data:
             message = MessageTemplates.user_stats(user_data)
             await query.edit_message_text(message, reply_markup=back_keyboard())
     
-    async def _handle_daily_reward(self, query, user_id):
+    async def _handle_daily_reward(self, query, user_id, data=None, context=None):
         """Handle daily reward claim"""
-        if self.db.can_claim_daily_reward(user_id):
-            if self.db.claim_daily_reward(user_id, DAILY_REWARD_POINTS):
-                message = MESSAGES['daily_reward_claimed'].format(points=DAILY_REWARD_POINTS)
-            else:
-                message = "❌ حدث خطأ، حاول مرة أخرى"
+        # The claim itself is the eligibility check (atomic guarded UPDATE),
+        # so no separate can_claim read is needed here
+        if self.db.claim_daily_reward(user_id, DAILY_REWARD_POINTS):
+            self._invalidate_user(user_id)
+            message = DAILY_REWARD_MESSAGE
         else:
             message = MESSAGES['daily_reward_already_claimed']
         
         await query.edit_message_text(message, reply_markup=back_keyboard())
     
-    async def _handle_referral(self, query, user_id, context):
+    async def _handle_referral(self, query, user_id, data=None, context=None):
         """Handle referral link generation"""
-        if not self.bot_username:
-            bot_info = await context.bot.get_me()
-            self.bot_username = bot_info.username
-        
-        referral_link = generate_referral_link(self.bot_username, user_id)
-        message = MESSAGES['referral_link'].format(link=referral_link, points=REFERRAL_POINTS)
+        referral_link = generate_referral_link(await self._get_bot_username(context.bot), user_id)
+        message = _format_referral_link(link=referral_link, points=REFERRAL_POINTS)
         
         await query.edit_message_text(message, reply_markup=back_keyboard())
     
-    async def _handle_channels(self, query, context=None):
+    async def _handle_channels(self, query, user_id=None, data=None, context=None):
         """Handle normal channels list display with smart filtering"""
         user_id = query.from_user.id
         
@@ -197,46 +294,27 @@ class BotHandlers:
         if context:
             await self._verify_user_subscriptions(context.bot, user_id)
         
-        # Get normal channels only
-        all_channels = self.db.get_active_channels('normal')
-        user_subscriptions = self.db.get_user_subscriptions(user_id)
-        
-        logging.info(f"Available normal channels: {len(all_channels)}, User subscriptions: {user_subscriptions}")
-        
-        # Smart filtering: Show channels the user can join
-        channels = []
-        for channel in all_channels:
-            if channel['username'] not in user_subscriptions:
-                # User has never joined this channel via bot - show it
-                channels.append(channel)
-                logging.info(f"Showing channel @{channel['username']} - user not subscribed")
-            elif context:
-                # User has subscription record - check if they're still actually in the channel
-                is_still_member = await check_user_membership(context.bot, user_id, channel['username'])
-                if not is_still_member:
-                    # User left but record exists - clean up and allow re-joining
-                    self.db.penalize_channel_leaver(user_id, channel['username'], 0)
-                    channels.append(channel)
-                    logging.info(f"Showing channel @{channel['username']} - user returned externally")
-                else:
-                    logging.info(f"Hiding channel @{channel['username']} - user still subscribed and present")
-        
+        # Smart filtering: Show channels the user can join (set difference in SQL)
+        if context:
+            channels = await self._get_joinable_channels(context.bot, user_id, 'normal')
+        else:
+            channels = self.db.get_channels_not_subscribed_by_user(user_id, 'normal')
+
+        logging.info("Joinable normal channels for %s: %d", user_id, len(channels))
+
         if not channels:
             await query.edit_message_text("📢 لا توجد قنوات عادية متاحة للانضمام حالياً", reply_markup=back_keyboard())
             return
         
+        # channels only contains entries the user is not subscribed to, so the
+        # old "subscribed in N channels" status line could never show
         message = f"📢 القنوات العادية ({len(channels)} متاحة):\n\n"
         message += "💰 كل قناة تمنحك 3 نقاط\n\n"
-        
-        # Add status info for user
-        subscribed_count = len([ch for ch in channels if ch['username'] in user_subscriptions])
-        if subscribed_count > 0:
-            message += f"✅ أنت مشترك في {subscribed_count} قناة\n"
         message += "👆 اختر قناة:"
         
         await query.edit_message_text(message, reply_markup=channels_keyboard(channels))
     
-    async def _handle_vip_channels(self, query, context=None):
+    async def _handle_vip_channels(self, query, user_id=None, data=None, context=None):
         """Handle VIP channels list display"""
         user_id = query.from_user.id
         
@@ -244,144 +322,85 @@ class BotHandlers:
         if context:
             await self._verify_user_subscriptions(context.bot, user_id)
         
-        # Get VIP channels only
-        all_channels = self.db.get_active_channels('vip')
-        user_subscriptions = self.db.get_user_subscriptions(user_id)
-        
-        logging.info(f"Available VIP channels: {len(all_channels)}, User subscriptions: {user_subscriptions}")
-        
-        # Smart filtering: Show channels the user can join
-        channels = []
-        for channel in all_channels:
-            if channel['username'] not in user_subscriptions:
-                # User has never joined this channel via bot - show it
-                channels.append(channel)
-                logging.info(f"Showing VIP channel @{channel['username']} - user not subscribed")
-            elif context:
-                # User has subscription record - check if they're still actually in the channel
-                is_still_member = await check_user_membership(context.bot, user_id, channel['username'])
-                if not is_still_member:
-                    # User left but record exists - clean up and allow re-joining
-                    self.db.penalize_channel_leaver(user_id, channel['username'], 0)
-                    channels.append(channel)
-                    logging.info(f"Showing VIP channel @{channel['username']} - user returned externally")
-                else:
-                    logging.info(f"Hiding VIP channel @{channel['username']} - user still subscribed and present")
-        
+        # Smart filtering: Show channels the user can join (set difference in SQL)
+        if context:
+            channels = await self._get_joinable_channels(context.bot, user_id, 'vip')
+        else:
+            channels = self.db.get_channels_not_subscribed_by_user(user_id, 'vip')
+
+        logging.info("Joinable VIP channels for %s: %d", user_id, len(channels))
+
         if not channels:
             await query.edit_message_text("⭐ لا توجد قنوات VIP متاحة للانضمام حالياً", reply_markup=back_keyboard())
             return
         
-        message = "⭐ قنوات VIP المتاحة للانضمام:\n\n"
-        for channel in channels:
-            progress = f"{channel['gained']}/{channel['target']}"
-            message += f"@{channel['username']} - VIP ⭐ ({VIP_CHANNEL_POINTS} نقاط)\nالتقدم: {progress}\n\n"
+        message = "⭐ قنوات VIP المتاحة للانضمام:\n\n" + "\n\n".join(
+            f"@{channel['username']} - VIP ⭐ ({VIP_CHANNEL_POINTS} نقاط)\nالتقدم: {channel['gained']}/{channel['target']}"
+            for channel in channels
+        )
         
         await query.edit_message_text(message, reply_markup=vip_channels_keyboard(channels))
     
-    async def _handle_refresh_channels(self, query, context):
+    async def _handle_refresh_channels(self, query, user_id=None, data=None, context=None):
         """Handle channels refresh with member count update"""
         user_id = query.from_user.id
         all_channels = self.db.get_active_channels()
-        
-        # Update member counts and check for leavers for all channels
-        for channel in all_channels:
-            # Check for users who left the channel and penalize them (5 points penalty)
-            await self._check_channel_leavers(context.bot, channel['username'])
-            
-            # Update channel member count
-            completed = self.db.update_channel_members(channel['username'])  # Smart bot-only counting
-            if completed:
-                # Channel completed, log it
-                logging.info(f"✅ Channel @{channel['username']} completed its target during refresh")
-        
-        # Get updated channels available for this user (with real-time checking)
-        all_channels = self.db.get_available_channels_for_user(user_id)
-        user_subscriptions = self.db.get_user_subscriptions(user_id)
-        
-        # Smart filtering: Show channels the user can join
-        channels = []
-        for channel in all_channels:
-            if channel['username'] not in user_subscriptions:
-                # User has never joined this channel via bot - show it
-                channels.append(channel)
-            else:
-                # User has subscription record - check if they're still actually in the channel
-                is_still_member = await check_user_membership(context.bot, user_id, channel['username'])
-                if not is_still_member:
-                    # User left but record exists - clean up and allow re-joining
-                    self.db.penalize_channel_leaver(user_id, channel['username'], 0)
-                    channels.append(channel)
-        
+
+        # Probe all channels concurrently, then penalize and recount in bulk
+        await self._refresh_channels_state(context.bot, all_channels)
+
+        # Smart filtering: Show channels the user can join (set difference in SQL)
+        channels = await self._get_joinable_channels(context.bot, user_id)
+
         if not channels:
             await query.edit_message_text("📢 لا توجد قنوات متاحة للانضمام حالياً\n\n🔄 تم تحديث عدد الأعضاء", reply_markup=back_keyboard())
             return
         
-        message = "📢 القنوات المتاحة للانضمام:\n\n"
-        for channel in channels:
-            channel_type = "VIP ⭐" if channel['type'] == 'vip' else "عادية"
-            points = VIP_CHANNEL_POINTS if channel['type'] == 'vip' else NORMAL_CHANNEL_POINTS
-            progress = f"{channel['gained']}/{channel['target']}"
-            message += f"@{channel['username']} - {channel_type} ({points} نقاط)\nالتقدم: {progress}\n\n"
-        
-        message += "\n🔄 تم تحديث عدد الأعضاء"
+        message = "📢 القنوات المتاحة للانضمام:\n\n" + "\n\n".join(
+            f"@{channel['username']} - "
+            f"{'VIP ⭐' if channel['type'] == 'vip' else 'عادية'} "
+            f"({VIP_CHANNEL_POINTS if channel['type'] == 'vip' else NORMAL_CHANNEL_POINTS} نقاط)\n"
+            f"التقدم: {channel['gained']}/{channel['target']}"
+            for channel in channels
+        )
+        message += "\n\n\n🔄 تم تحديث عدد الأعضاء"
         await query.edit_message_text(message, reply_markup=channels_keyboard(channels))
     
-    async def _handle_refresh_vip_channels(self, query, context):
+    async def _handle_refresh_vip_channels(self, query, user_id=None, data=None, context=None):
         """Handle VIP channels refresh"""
         user_id = query.from_user.id
         all_channels = self.db.get_active_channels('vip')
-        
-        # Update member counts and check for leavers for VIP channels
-        for channel in all_channels:
-            await self._check_channel_leavers(context.bot, channel['username'])
-            completed = self.db.update_channel_members(channel['username'])
-            if completed:
-                logging.info(f"✅ VIP Channel @{channel['username']} completed its target during refresh")
-        
-        # Get updated VIP channels
-        all_channels = self.db.get_active_channels('vip')
-        user_subscriptions = self.db.get_user_subscriptions(user_id)
-        
-        channels = []
-        for channel in all_channels:
-            if channel['username'] not in user_subscriptions:
-                channels.append(channel)
-            else:
-                is_still_member = await check_user_membership(context.bot, user_id, channel['username'])
-                if not is_still_member:
-                    self.db.penalize_channel_leaver(user_id, channel['username'], 0)
-                    channels.append(channel)
-        
+
+        # Probe all channels concurrently, then penalize and recount in bulk
+        await self._refresh_channels_state(context.bot, all_channels)
+
+        # Smart filtering: Show VIP channels the user can join (set difference in SQL)
+        channels = await self._get_joinable_channels(context.bot, user_id, 'vip')
+
         if not channels:
             await query.edit_message_text("⭐ لا توجد قنوات VIP متاحة للانضمام حالياً\n\n🔄 تم تحديث عدد الأعضاء", reply_markup=back_keyboard())
             return
         
-        message = "⭐ قنوات VIP المتاحة للانضمام:\n\n"
-        for channel in channels:
-            progress = f"{channel['gained']}/{channel['target']}"
-            message += f"@{channel['username']} - VIP ⭐ ({VIP_CHANNEL_POINTS} نقاط)\nالتقدم: {progress}\n\n"
-        
-        message += "\n🔄 تم تحديث عدد الأعضاء"
+        message = "⭐ قنوات VIP المتاحة للانضمام:\n\n" + "\n\n".join(
+            f"@{channel['username']} - VIP ⭐ ({VIP_CHANNEL_POINTS} نقاط)\nالتقدم: {channel['gained']}/{channel['target']}"
+            for channel in channels
+        )
+        message += "\n\n\n🔄 تم تحديث عدد الأعضاء"
         await query.edit_message_text(message, reply_markup=vip_channels_keyboard(channels))
     
-    async def _handle_shop(self, query):
+    async def _handle_shop(self, query, user_id=None, data=None, context=None):
         """Handle shop display"""
-        message = "🛒 متجر شراء الأعضاء:\n\nاختر الباقة المناسبة لك:\n\n"
-        for members, points in SHOP_PRICES.items():
-            message += f"• {members} عضو = {points} نقطة\n"
-        
-        await query.edit_message_text(message, reply_markup=shop_keyboard())
+        await query.edit_message_text(SHOP_MESSAGE, reply_markup=shop_keyboard())
     
     async def _handle_buy(self, query, user_id, data, context):
         """Handle buy request"""
-        members_count = int(data.split('_')[1])
+        members_count = int(data.partition('_')[2])
         points_cost = SHOP_PRICES[members_count]
         
-        user_data = self.db.get_user(user_id)
+        user_data = self._get_user_cached(user_id)
         if not user_data or user_data['points'] < points_cost:
             current_points = user_data['points'] if user_data else 0
-            message = MESSAGES['insufficient_points'].format(required=points_cost, current=current_points)
+            message = _format_insufficient_points(required=points_cost, current=current_points)
             await query.edit_message_text(message, reply_markup=back_keyboard())
             return
         
@@ -401,7 +420,7 @@ class BotHandlers:
     
     async def _handle_join_channel(self, query, user_id, data, context):
         """Handle channel join verification"""
-        channel_username = data.split('_', 1)[1]
+        channel_username = data.partition('_')[2]
         
         # First check if user already joined this channel via bot
         user_subscriptions = self.db.get_user_subscriptions(user_id)
@@ -419,69 +438,59 @@ class BotHandlers:
             return
         
         # Get channel info and award points
-        channels = self.db.get_active_channels()
-        channel_info = next((c for c in channels if c['username'] == channel_username), None)
-        
+        channel_info = self.db.get_channel_by_username(channel_username)
+
         if not channel_info:
             await query.edit_message_text("❌ القناة غير متاحة", reply_markup=back_keyboard())
             return
         
         points = VIP_CHANNEL_POINTS if channel_info['type'] == 'vip' else NORMAL_CHANNEL_POINTS
         
-        # Record the join and award points - user is confirmed to be a new legitimate member
-        success = self.db.user_joined_channel(user_id, channel_username, points)
-        
+        # Record the join, award points and recount the channel in one commit
+        success, completed, order_owner_id, gained, target = self.db.record_join_and_update(
+            user_id, channel_username, points
+        )
+
         if success:
-            # Update channel count immediately - smart counting of bot users only
-            completed, order_owner_id = self.db.update_channel_members(channel_username)
-            
-            # Send notification to order owner about new member
+            self._invalidate_user(user_id)
+            invalidate_membership(user_id, channel_username)
+
+            # Notify the order owner about the new member in the background
             if order_owner_id and order_owner_id != user_id:
-                user_info = self.db.get_user(user_id)
+                user_info = self._get_user_cached(user_id)
                 user_name = f"@{user_info['username']}" if user_info.get('username') else user_info['first_name']
-                
-                try:
-                    await context.bot.send_message(
-                        chat_id=order_owner_id,
-                        text=f"🎉 عضو جديد انضم لقناتك!\n\n"
-                             f"📢 القناة: @{channel_username}\n"
-                             f"👤 العضو الجديد: {user_name}\n"
-                             f"🆔 معرف المستخدم: {user_id}\n"
-                             f"📊 معلومات إضافية: {user_info['points']} نقطة، انضم في {user_info['joined_at'][:10]}"
-                    )
-                except Exception as e:
-                    logging.error(f"Failed to notify order owner {order_owner_id}: {e}")
-            
+
+                self._notify(
+                    context.bot,
+                    order_owner_id,
+                    f"🎉 عضو جديد انضم لقناتك!\n\n"
+                    f"📢 القناة: @{channel_username}\n"
+                    f"👤 العضو الجديد: {user_name}\n"
+                    f"🆔 معرف المستخدم: {user_id}\n"
+                    f"📊 معلومات إضافية: {user_info['points']} نقطة، انضم في {user_info['joined_at'][:10]}"
+                )
+
             if completed:
                 message = f"🎉 تم كسب {points} نقطة!\n✅ القناة وصلت للهدف المطلوب وتم إكمال الطلب!"
-                
-                # Notify admin and order owner about completion
-                try:
-                    completion_message = f"🎯 تم إكمال طلب!\n\n📢 القناة: @{channel_username}\n✅ تم الوصول للهدف المطلوب"
-                    
-                    # Notify admin
-                    await context.bot.send_message(
-                        chat_id=ADMIN_ID,
-                        text=completion_message
+
+                # Completion notifications also go out in the background
+                self._notify(
+                    context.bot,
+                    ADMIN_ID,
+                    f"🎯 تم إكمال طلب!\n\n📢 القناة: @{channel_username}\n✅ تم الوصول للهدف المطلوب"
+                )
+                if order_owner_id and order_owner_id != ADMIN_ID:
+                    self._notify(
+                        context.bot,
+                        order_owner_id,
+                        f"🎉 تهانينا! تم إكمال طلبك!\n\n📢 القناة: @{channel_username}\n✅ تم الوصول للعدد المطلوب من الأعضاء\n\n🙏 شكراً لاستخدام خدماتنا"
                     )
-                    
-                    # Notify order owner if different from admin
-                    if order_owner_id and order_owner_id != ADMIN_ID:
-                        await context.bot.send_message(
-                            chat_id=order_owner_id,
-                            text=f"🎉 تهانينا! تم إكمال طلبك!\n\n📢 القناة: @{channel_username}\n✅ تم الوصول للعدد المطلوب من الأعضاء\n\n🙏 شكراً لاستخدام خدماتنا"
-                        )
-                except Exception as e:
-                    logging.error(f"Failed to send completion notifications: {e}")
-                
-                logging.info(f"✅ Channel @{channel_username} completed its target and was deactivated")
+
+                logging.info("✅ Channel @%s completed its target and was deactivated", channel_username)
             else:
-                # Get updated channel info to show real progress
-                channels = self.db.get_active_channels()
-                channel_info = next((c for c in channels if c['username'] == channel_username), None)
-                if channel_info:
-                    progress = f"{channel_info['gained']}/{channel_info['target']}"
-                    message = f"🎉 تم كسب {points} نقطة!\n📊 التقدم الحالي: {progress}\n\n✅ تم التحقق من صحة حسابك"
+                # record_join_and_update already returned the fresh progress
+                if target:
+                    message = f"🎉 تم كسب {points} نقطة!\n📊 التقدم الحالي: {gained}/{target}\n\n✅ تم التحقق من صحة حسابك"
                 else:
                     message = f"🎉 تم كسب {points} نقطة!\n✅ تم التحقق من صحة حسابك"
         else:
@@ -489,48 +498,134 @@ class BotHandlers:
         
         await query.edit_message_text(message, reply_markup=back_keyboard())
     
+    async def _probe_membership(self, bot, user_id, channel_username):
+        """Bounded-concurrency membership probe returning (key, is_member)"""
+        async with self._probe_sem:
+            return channel_username, await check_user_membership_cached(bot, user_id, channel_username)
+
+    async def _get_joinable_channels(self, bot, user_id, channel_type=None):
+        """Return channels the user can join; the set difference runs in SQL
+
+        Channels with a stale subscription record (the user left externally)
+        are probed concurrently, cleaned up and offered again.
+        """
+        annotated = self.db.get_channels_with_subscription_flag(user_id, channel_type)
+        channels = [c for c in annotated if not c['subscribed']]
+        recorded = [c for c in annotated if c['subscribed']]
+
+        if recorded:
+            results = await asyncio.gather(
+                *[self._probe_membership(bot, user_id, c['username']) for c in recorded],
+                return_exceptions=True
+            )
+            by_name = {c['username']: c for c in recorded}
+            for result in results:
+                if isinstance(result, Exception):
+                    continue
+                username, is_member = result
+                if not is_member:
+                    # User left but record exists - clean up and allow re-joining
+                    self.db.penalize_channel_leaver(user_id, username, 0)
+                    self._invalidate_user(user_id)
+                    invalidate_membership(user_id, username)
+                    channels.append(by_name[username])
+
+        return channels
+
     async def _verify_user_subscriptions(self, bot, user_id):
         """Verify and clean up a specific user's channel subscriptions"""
         try:
             # Get all channels this user is subscribed to in the database
             user_subscriptions = self.db.get_user_subscriptions(user_id)
+            if not user_subscriptions:
+                return
             
-            for channel_username in user_subscriptions:
-                # Check if user is still actually a member
-                is_member = await check_user_membership(bot, user_id, channel_username)
+            # Probe all recorded channels concurrently instead of one RTT each
+            results = await asyncio.gather(
+                *[self._probe_membership(bot, user_id, channel) for channel in user_subscriptions],
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    continue
+                channel_username, is_member = result
                 if not is_member:
                     # User left the channel, penalize them
                     self.db.penalize_channel_leaver(user_id, channel_username, 5)
-                    logging.info(f"✅ User {user_id} penalized for leaving channel @{channel_username} (5 points deducted)")
+                    self._invalidate_user(user_id)
+                    invalidate_membership(user_id, channel_username)
+                    logging.info("✅ User %s penalized for leaving channel @%s (5 points deducted)", user_id, channel_username)
                     
         except Exception as e:
-            logging.error(f"Error verifying user {user_id} subscriptions: {e}")
+            logging.error("Error verifying user %s subscriptions: %s", user_id, e)
+
+    async def _refresh_channels_state(self, bot, channels):
+        """Refresh many channels at once: concurrent leaver probes, one
+        penalty transaction, one bulk member recount"""
+        probes = [(channel['username'], uid)
+                  for channel in channels
+                  for uid in self.db.get_channel_subscribers(channel['username'])]
+
+        leavers_by_channel = {}
+        if probes:
+            async def probe(username, uid):
+                async with self._probe_sem:
+                    return username, uid, await check_user_membership_cached(bot, uid, username)
+
+            results = await asyncio.gather(
+                *[probe(username, uid) for username, uid in probes],
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    continue
+                username, uid, is_member = result
+                if not is_member:
+                    leavers_by_channel.setdefault(username, []).append(uid)
+
+        if leavers_by_channel:
+            self.db.bulk_penalize_leavers(leavers_by_channel, 5)
+            for username, user_ids in leavers_by_channel.items():
+                for uid in user_ids:
+                    self._invalidate_user(uid)
+                    invalidate_membership(uid, username)
+
+        completed = self.db.update_all_channel_members([c['username'] for c in channels])
+        for username in completed:
+            logging.info("✅ Channel @%s completed its target during refresh", username)
 
     async def _check_channel_leavers(self, bot, channel_username):
         """Check for users who left the channel and penalize them"""
         try:
             # Get all users who joined this channel
             joined_users = self.db.get_channel_subscribers(channel_username)
+            if not joined_users:
+                return
             
-            for user_id in joined_users:
-                # Check if user is still a member
-                is_member = await check_user_membership(bot, user_id, channel_username)
-                if not is_member:
-                    # User left the channel, penalize them
-                    self.db.penalize_channel_leaver(user_id, channel_username, 5)
+            async def probe(uid):
+                async with self._probe_sem:
+                    return uid, await check_user_membership_cached(bot, uid, channel_username)
+            
+            results = await asyncio.gather(*[probe(uid) for uid in joined_users], return_exceptions=True)
+            leavers = [uid for uid, is_member in
+                       (r for r in results if not isinstance(r, Exception))
+                       if not is_member]
+            
+            if leavers:
+                # One transaction penalizes the whole batch
+                self.db.penalize_channel_leavers_bulk(leavers, channel_username, 5)
                     
         except Exception as e:
-            logging.error(f"Error checking channel leavers for {channel_username}: {e}")
+            logging.error("Error checking channel leavers for %s: %s", channel_username, e)
     
     async def _handle_confirmation(self, query, user_id, data, context):
         """Handle confirmation actions"""
-        parts = data.split('_', 2)
-        if len(parts) != 3:
+        # confirm_<action>_<data>; partition avoids the throwaway list
+        rest = data.partition('_')[2]
+        action, sep, action_data = rest.partition('_')
+        if not sep or not action_data:
             return
         
-        action = parts[1]
-        action_data = parts[2]
-        
         if action == "buy" and context.user_data.get('purchase_data'):
             purchase_data = context.user_data['purchase_data']
             channel_username = action_data
@@ -539,6 +634,7 @@ class BotHandlers:
             # Get current member count as initial count
             initial_count = await get_channel_member_count(context.bot, channel_username)
             
+            self._invalidate_user(user_id)
             order_id = self.db.create_order(
                 user_id=user_id,
                 channel_username=channel_username,
@@ -551,26 +647,19 @@ class BotHandlers:
                 # Clear purchase data
                 context.user_data.pop('purchase_data', None)
                 
-                # Send admin notification about purchase
-                try:
-                    buyer_info = self.db.get_user(user_id)
-                    admin_purchase_msg = f"💰 طلب شراء جديد!\n\n"
-                    admin_purchase_msg += f"👤 المشتري: {buyer_info['first_name']}\n"
-                    if buyer_info.get('username'):
-                        admin_purchase_msg += f"📱 المعرف: @{buyer_info['username']}\n"
-                    admin_purchase_msg += f"🆔 ID: {user_id}\n"
-                    admin_purchase_msg += f"📢 القناة: @{channel_username}\n"
-                    admin_purchase_msg += f"👥 عدد الأعضاء: {purchase_data['members_count']}\n"
-                    admin_purchase_msg += f"💎 النقاط المدفوعة: {purchase_data['points_cost']}\n"
-                    admin_purchase_msg += f"🆔 رقم الطلب: #{order_id}"
-                    
-                    await context.bot.send_message(
-                        chat_id=ADMIN_ID,
-                        text=admin_purchase_msg
-                    )
-                except TelegramError:
-                    logging.error("Failed to send purchase notification to admin")
-                
+                # Send admin notification about the purchase in the background
+                buyer_info = self._get_user_cached(user_id)
+                admin_purchase_msg = f"💰 طلب شراء جديد!\n\n"
+                admin_purchase_msg += f"👤 المشتري: {buyer_info['first_name']}\n"
+                if buyer_info.get('username'):
+                    admin_purchase_msg += f"📱 المعرف: @{buyer_info['username']}\n"
+                admin_purchase_msg += f"🆔 ID: {user_id}\n"
+                admin_purchase_msg += f"📢 القناة: @{channel_username}\n"
+                admin_purchase_msg += f"👥 عدد الأعضاء: {purchase_data['members_count']}\n"
+                admin_purchase_msg += f"💎 النقاط المدفوعة: {purchase_data['points_cost']}\n"
+                admin_purchase_msg += f"🆔 رقم الطلب: #{order_id}"
+                self._notify(context.bot, ADMIN_ID, admin_purchase_msg)
+
                 # Show success message first, then redirect to channels
                 success_message = MessageTemplates.order_confirmation(
                     channel_username,
@@ -595,14 +684,14 @@ class BotHandlers:
                 context.user_data.pop('purchase_data', None)
                 await query.edit_message_text(message, reply_markup=back_keyboard())
     
-    async def _handle_back_to_main(self, query):
+    async def _handle_back_to_main(self, query, user_id=None, data=None, context=None):
         """Handle back to main menu"""
         await query.edit_message_text(
             MESSAGES['welcome'],
             reply_markup=main_keyboard()
         )
     
-    async def _handle_redeem_code_prompt(self, query, context):
+    async def _handle_redeem_code_prompt(self, query, user_id=None, data=None, context=None):
         """Handle redeem code prompt"""
         await query.edit_message_text(
             "🎟️ أرسل الكود الذي تريد استخدامه:",
@@ -614,22 +703,20 @@ class BotHandlers:
     async def _handle_special_content(self, query, user_id, context):
         """Handle special content display for channel leavers only"""
         try:
-            # Get all active channels to check user status
-            all_channels = self.db.get_active_channels()
-            user_subscriptions = self.db.get_user_subscriptions(user_id)
-            
+            # Subscriptions and leaver flag come back in one query
+            state = self.db.get_subscription_state(user_id)
+
             # Check if user is currently subscribed to any channels
-            if user_subscriptions:
+            if state['subscriptions'] and context:
                 # User is currently subscribed - check if they are still actual members
-                if context:
-                    await self._verify_user_subscriptions(context.bot, user_id)
-                    # Re-check subscriptions after verification
-                    user_subscriptions = self.db.get_user_subscriptions(user_id)
-            
+                await self._verify_user_subscriptions(context.bot, user_id)
+                # Re-check state after verification cleaned up stale records
+                state = self.db.get_subscription_state(user_id)
+
             # Only show content if user is not currently subscribed to any channels
             # OR if user is a known channel leaver
-            is_leaver = self.db.is_channel_leaver(user_id)
-            has_active_subscriptions = len(user_subscriptions) > 0
+            is_leaver = state['is_leaver']
+            has_active_subscriptions = len(state['subscriptions']) > 0
             
             if has_active_subscriptions and not is_leaver:
                 # User is currently subscribed and not a known leaver - hide content
@@ -643,40 +730,50 @@ class BotHandlers:
             special_content = self.db.get_special_content()
             
             if not special_content:
-                # No special content available - add some default content
-                self.db.add_special_content(
-                    "رسالة ترحيب خاصة",
-                    "🎉 مرحباً بك في المحتوى الخاص!\n\n"
-                    "هذا المحتوى متاح فقط للمستخدمين الذين لم يشتركوا في القنوات أو الذين غادروا القنوات.\n\n"
-                    "💡 نصائح خاصة:\n"
-                    "• يمكنك الحصول على نقاط إضافية من الأنشطة الخاصة\n"
-                    "• إذا اشتركت في قناة ثم غادرتها، ستخسر 5 نقاط لكن ستعود لرؤية هذا المحتوى\n"
-                    "• المحتوى الخاص يتم تحديثه بانتظام\n\n"
-                    "📞 للمزيد من المعلومات، تواصل مع الإدارة"
-                )
-                special_content = self.db.get_special_content()
+                # No special content yet - seed the default row and serve the
+                # constant directly instead of reading it back from the DB
+                default = DEFAULT_SPECIAL_CONTENT[0]
+                self.db.add_special_content(default['content_title'], default['content_message'])
+                special_content = DEFAULT_SPECIAL_CONTENT
             
+            body, extra = self._render_special_content(special_content)
             message = "💬 المحتوى الخاص\n\n"
             message += "✅ يمكنك الوصول للمحتوى الخاص لأنك غير مشترك في القنوات\n\n"
+            message += body
+            if extra:
+                message += f"💡 يوجد {extra} محتوى إضافي..."
             
-            for content in special_content[:3]:  # Show first 3 items
-                message += f"📝 **{content['content_title']}**\n"
-                message += f"{content['content_message']}\n\n"
-                message += "───────────────\n\n"
-            
-            if len(special_content) > 3:
-                message += f"💡 يوجد {len(special_content) - 3} محتوى إضافي..."
-            
-            await query.edit_message_text(message, reply_markup=back_keyboard(), parse_mode='Markdown')
+            await query.edit_message_text(message, reply_markup=back_keyboard())
             
         except Exception as e:
-            logging.error(f"Error handling special content: {e}")
+            logging.error("Error handling special content: %s", e)
             await query.edit_message_text(
                 "❌ حدث خطأ في تحميل المحتوى الخاص",
                 reply_markup=back_keyboard()
             )
     
     
+    def _render_special_content(self, special_content):
+        """Render the top-3 content block once per content version
+
+        The block is identical for every user, so it is cached until
+        Database.special_content_version changes.
+        """
+        version = self.db.special_content_version
+        cached = self._special_render
+        if cached and cached[0] == version:
+            return cached[1], cached[2]
+
+        body = "".join(
+            f"📝 {content['content_title']}\n"
+            f"{content['content_message']}\n\n"
+            "───────────────\n\n"
+            for content in special_content[:3]  # Show first 3 items
+        )
+        extra = max(len(special_content) - 3, 0)
+        self._special_render = (version, body, extra)
+        return body, extra
+
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle text messages"""
         if not update or not update.effective_user:
@@ -697,19 +794,20 @@ class BotHandlers:
             context.user_data.pop('awaiting_code', None)
             
             result = self.db.redeem_code(user_id, text)
+            self._invalidate_user(user_id)
             if result is None:
                 message = MESSAGES['invalid_code']
             elif result == -1:
                 message = MESSAGES['code_already_used']
             else:
-                message = MESSAGES['code_redeemed'].format(points=result)
+                message = _format_code_redeemed(points=result)
             
             await update.message.reply_text(message, reply_markup=main_keyboard())
             return
         
         # Handle channel username for purchase
-        if context.user_data.get('purchase_data', {}).get('awaiting_channel'):
-            context.user_data['purchase_data']['awaiting_channel'] = False
+        if (purchase_data := context.user_data.get('purchase_data')) and purchase_data.get('awaiting_channel'):
+            purchase_data['awaiting_channel'] = False
             
             # Validate channel username
             if not is_valid_channel_username(text):
@@ -723,7 +821,7 @@ class BotHandlers:
             
             # Check if channel exists and get member count
             try:
-                current_count = await get_channel_member_count(context.bot, channel_username)
+                current_count = await get_channel_member_count_cached(context.bot, channel_username)
                 if current_count == 0:
                     await update.message.reply_text(
                         "❌ القناة غير موجودة أو لا يمكن الوصول إليها\nتأكد من أن البوت مدير في القناة",
@@ -737,8 +835,6 @@ class BotHandlers:
                 )
                 return
             
-            purchase_data = context.user_data['purchase_data']
-            
             # Show confirmation
             message = (
                 f"📝 تأكيد الطلب:\n\n"
@@ -766,68 +862,74 @@ class BotHandlers:
         user_id = update.effective_user.id
         text = update.message.text.strip()
         
-        expected_code = context.user_data.get('verification_code')
-        attempts = context.user_data.get('verification_attempts', 0)
+        # One local alias; user_data is hit several times on this path
+        state = context.user_data
+        expected_code = state.get('verification_code')
         
         # Check if the entered number matches
         try:
             entered_code = int(text)
             if entered_code == expected_code:
-                # Verification successful
-                context.user_data['verified'] = True
-                context.user_data.pop('awaiting_verification', None)
-                context.user_data.pop('verification_code', None)
-                context.user_data.pop('verification_attempts', None)
+                # Verification successful - clear all verification keys
+                state['verified'] = True
+                for key in ('awaiting_verification', 'verification_code', 'verification_attempts'):
+                    state.pop(key, None)
                 
                 # Now proceed with normal /start flow
-                referred_by = context.user_data.pop('referred_by', None)
+                referred_by = state.pop('referred_by', None)
                 
                 # Continue with user registration
                 await self._complete_user_registration(update, context, referred_by)
                 
             else:
                 # Wrong code
-                attempts += 1
-                context.user_data['verification_attempts'] = attempts
-                
-                if attempts >= 3:
-                    # Too many attempts, block user
-                    await update.message.reply_text(
-                        "❌ فشل التحقق بعد 3 محاولات\n\n"
-                        "تم رفض دخولك للبوت لأسباب أمنية.\n"
-                        "يمكنك المحاولة مرة أخرى لاحقاً بالضغط على /start"
-                    )
-                    # Clear all verification data
-                    context.user_data.clear()
-                else:
-                    # Allow retry
-                    remaining = 3 - attempts
-                    await update.message.reply_text(
-                        f"❌ الرقم خاطئ!\n\n"
-                        f"يرجى كتابة الرقم **{expected_code}** بالضبط\n\n"
-                        f"⚠️ المحاولات المتبقية: {remaining}",
-                        parse_mode='Markdown'
-                    )
+                await self._record_failed_attempt(update, context, expected_code, _format_wrong_code)
         except ValueError:
             # Not a number
-            attempts += 1
-            context.user_data['verification_attempts'] = attempts
-            
-            if attempts >= 3:
-                await update.message.reply_text(
-                    "❌ فشل التحقق بعد 3 محاولات\n\n"
-                    "تم رفض دخولك للبوت لأسباب أمنية.\n"
-                    "يمكنك المحاولة مرة أخرى لاحقاً بالضغط على /start"
-                )
-                context.user_data.clear()
+            await self._record_failed_attempt(update, context, expected_code, _format_not_a_number)
+
+    async def _record_failed_attempt(self, update, context, expected_code, retry_format):
+        """Count a failed verification attempt: block at 3, otherwise retry"""
+        attempts = context.user_data.get('verification_attempts', 0) + 1
+        context.user_data['verification_attempts'] = attempts
+
+        if attempts >= 3:
+            # Too many attempts, block user and clear all verification data
+            await update.message.reply_text(VERIFICATION_BLOCKED_MESSAGE)
+            context.user_data.clear()
+        else:
+            await update.message.reply_text(
+                retry_format(expected_code=expected_code, remaining=3 - attempts),
+                parse_mode='Markdown'
+            )
+
+    async def _notify_admin_new_user(self, bot, user, referred_by):
+        """Tell the admin about a new signup (off the welcome critical path)"""
+        try:
+            # Check if user is legitimate (has profile photo, first name, etc.)
+            user_verification = await check_user_legitimacy(bot, user)
+
+            lines = ["🆕 مستخدم جديد انضم للبوت!\n", f"👤 الاسم: {user.first_name}"]
+            if user.username:
+                lines.append(f"📱 المعرف: @{user.username}")
+            lines.append(f"🆔 ID: {user.id}")
+
+            # Add verification status
+            if user_verification['is_legitimate']:
+                lines.append("✅ المستخدم: حقيقي")
             else:
-                remaining = 3 - attempts
-                await update.message.reply_text(
-                    f"❌ يجب كتابة الرقم فقط!\n\n"
-                    f"الرقم المطلوب: **{expected_code}**\n\n"
-                    f"⚠️ المحاولات المتبقية: {remaining}",
-                    parse_mode='Markdown'
-                )
+                lines.append("⚠️ المستخدم: مشكوك فيه")
+                lines.append(f"📝 الأسباب: {', '.join(user_verification['warnings'])}")
+
+            lines.append("🔐 اجتاز التحقق الأمني: ✅")
+
+            if referred_by:
+                lines.append(f"👥 تم دعوته بواسطة: {referred_by}")
+            lines.append(f"\n📊 إجمالي المستخدمين: {self.db.total_users}")
+
+            await bot.send_message(chat_id=ADMIN_ID, text="\n".join(lines))
+        except TelegramError:
+            logging.error("Failed to send user notification to admin")
 
     async def _complete_user_registration(self, update: Update, context: ContextTypes.DEFAULT_TYPE, referred_by=None):
         """Complete user registration after successful verification"""
@@ -845,78 +947,43 @@ class BotHandlers:
         # Award referral points if user was referred and is new
         if user_added and referred_by and referred_by != user.id:
             self.db.update_user_points(referred_by, REFERRAL_POINTS)
-            
-            # Notify referrer
-            try:
-                await context.bot.send_message(
-                    chat_id=referred_by,
-                    text=f"🎉 تم قبول دعوتك!\nحصلت على {REFERRAL_POINTS} نقطة من دعوة @{user.username or user.first_name}"
-                )
-            except TelegramError:
-                pass
-        
+            self._invalidate_user(referred_by)
+
+            # Notify referrer in the background
+            self._notify(
+                context.bot,
+                referred_by,
+                f"🎉 تم قبول دعوتك!\nحصلت على {REFERRAL_POINTS} نقطة من دعوة @{user.username or user.first_name}"
+            )
+
         # Get bot username for referral links
-        if not self.bot_username:
-            bot_info = await context.bot.get_me()
-            self.bot_username = bot_info.username
-        
+        await self._get_bot_username(context.bot)
+
         # Check mandatory channels for all users (including returning ones)
-        mandatory_channels = self.db.get_mandatory_channels()
+        mandatory_channels = self._get_mandatory_channels_cached()
         if mandatory_channels:
-            from utils import check_mandatory_channels_membership
             all_subscribed, missing_channels = await check_mandatory_channels_membership(
                 context.bot, user_id, mandatory_channels
             )
-            
+
             if not all_subscribed:
                 # Show mandatory channels message
-                welcome_msg = "👋 أهلاً وسهلاً!\n\n🔒 للاستمرار، يجب الاشتراك في القنوات التالية:\n\n"
+                lines = ["👋 أهلاً وسهلاً!\n\n🔒 للاستمرار، يجب الاشتراك في القنوات التالية:\n"]
                 for channel in missing_channels:
-                    channel_link = f"https://t.me/{channel['channel_username']}"
-                    welcome_msg += f"📢 @{channel['channel_username']}\n"
+                    lines.append(f"📢 @{channel['channel_username']}")
                     if channel.get('channel_title'):
-                        welcome_msg += f"📝 {channel['channel_title']}\n"
-                    welcome_msg += f"{channel_link}\n\n"
-                welcome_msg += "✅ بعد الاشتراك، اضغط /start مرة أخرى"
-                
-                await update.message.reply_text(welcome_msg)
+                        lines.append(f"📝 {channel['channel_title']}")
+                    lines.append(f"https://t.me/{channel['channel_username']}\n")
+                lines.append("✅ بعد الاشتراك، اضغط /start مرة أخرى")
+
+                await update.message.reply_text("\n".join(lines))
                 return
-        
-        # Send admin notification ONLY for new users (not returning ones)
+
+        # Send admin notification ONLY for new users (not returning ones);
+        # runs in the background so the welcome message is not delayed by
+        # the legitimacy probe and the admin send
         if user_added:  # Only send notification for genuinely new users
-            # Get total user count
-            total_users = self.db.get_stats()['users']
-            
-            # Check if user is legitimate (has profile photo, first name, etc.)
-            user_verification = await check_user_legitimacy(context.bot, user)
-            
-            # Send notification to admin
-            try:
-                admin_message = f"🆕 مستخدم جديد انضم للبوت!\n\n"
-                admin_message += f"👤 الاسم: {user.first_name}\n"
-                if user.username:
-                    admin_message += f"📱 المعرف: @{user.username}\n"
-                admin_message += f"🆔 ID: {user.id}\n"
-                
-                # Add verification status
-                if user_verification['is_legitimate']:
-                    admin_message += f"✅ المستخدم: حقيقي\n"
-                else:
-                    admin_message += f"⚠️ المستخدم: مشكوك فيه\n"
-                    admin_message += f"📝 الأسباب: {', '.join(user_verification['warnings'])}\n"
-                
-                admin_message += f"🔐 اجتاز التحقق الأمني: ✅\n"
-                
-                if referred_by:
-                    admin_message += f"👥 تم دعوته بواسطة: {referred_by}\n"
-                admin_message += f"\n📊 إجمالي المستخدمين: {total_users}"
-                
-                await context.bot.send_message(
-                    chat_id=ADMIN_ID,
-                    text=admin_message
-                )
-            except TelegramError:
-                logging.error("Failed to send user notification to admin")
+            asyncio.create_task(self._notify_admin_new_user(context.bot, user, referred_by))
 
         # Welcome message for new user
         welcome_text = "🎉 مرحباً بك في بوت تجميع النقاط!\n\n📊 يمكنك كسب النقاط من خلال:\n• الانضمام للقنوات\n• دعوة الأصدقاء\n• المكافآت اليومية\n\n🛒 استخدم النقاط لشراء أعضاء لقناتك"
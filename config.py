@@ -4,9 +4,15 @@ import os
 BOT_TOKEN = os.getenv('BOT_TOKEN', 'your_bot_token_here')
 ADMIN_ID = int(os.getenv('ADMIN_ID', '123456789'))  # Replace with actual admin Telegram ID
 
+# Admin IDs as a frozenset for O(1) membership checks (ready for multiple admins)
+ADMIN_IDS = frozenset({ADMIN_ID})
+
 # Database Configuration
 DATABASE_PATH = 'bot_database.db'
 
+# Maximum length accepted for /addcontent payloads
+MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', '4096'))
+
 # Point System Configuration
 DAILY_REWARD_POINTS = 4
 REFERRAL_POINTS = 5
@@ -14,12 +20,15 @@ NORMAL_CHANNEL_POINTS = 3
 VIP_CHANNEL_POINTS = 4
 
 # Shop Configuration
-SHOP_PRICES = {
-    10: 20,   # 10 members = 20 points
-    25: 50,   # 25 members = 50 points
-    50: 100,  # 50 members = 100 points
-    100: 200  # 100 members = 200 points
-}
+# Ordered (members, points) tiers for iteration; SHOP_PRICES is the
+# lookup table by member count, built once here
+SHOP_TIERS = (
+    (10, 20),
+    (25, 50),
+    (50, 100),
+    (100, 200),
+)
+SHOP_PRICES = dict(SHOP_TIERS)
 
 # Bot Messages in Arabic
 MESSAGES = {
@@ -38,6 +47,21 @@ MESSAGES = {
     'code_already_used': '⚠️ لقد استخدمت هذا الكود من قبل'
 }
 
+# Seeded into special_content on first access so the section is never
+# empty; shaped like get_special_content rows
+DEFAULT_SPECIAL_CONTENT = [{
+    'content_title': 'رسالة ترحيب خاصة',
+    'content_message': (
+        '🎉 مرحباً بك في المحتوى الخاص!\n\n'
+        'هذا المحتوى متاح فقط للمستخدمين الذين لم يشتركوا في القنوات أو الذين غادروا القنوات.\n\n'
+        '💡 نصائح خاصة:\n'
+        '• يمكنك الحصول على نقاط إضافية من الأنشطة الخاصة\n'
+        '• إذا اشتركت في قناة ثم غادرتها، ستخسر 5 نقاط لكن ستعود لرؤية هذا المحتوى\n'
+        '• المحتوى الخاص يتم تحديثه بانتظام\n\n'
+        '📞 للمزيد من المعلومات، تواصل مع الإدارة'
+    ),
+}]
+
 # Admin Messages
 ADMIN_MESSAGES = {
     'user_not_found': '❌ المستخدم غير موجود',
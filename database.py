@@ -1,192 +1,387 @@
 import sqlite3
 import logging
+import time
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 import threading
 
+# Active channels are re-read on nearly every button press; a few seconds
+# of staleness is acceptable for the lists shown to users
+ACTIVE_CHANNELS_CACHE_TTL = 5
+
+# Special content only changes through admin commands, so it can stay
+# cached much longer than the channel lists
+SPECIAL_CONTENT_CACHE_TTL = 300
+
+# The admin stats screen tolerates slightly stale counts; a minute of
+# caching absorbs bursty dashboard refreshes
+STATS_CACHE_TTL = 60
+
+# Whole schema in one script so a cold start costs one transaction
+# instead of one autocommit per statement
+_SCHEMA_DDL = """
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT,
+    first_name TEXT,
+    points INTEGER DEFAULT 0,
+    referrals INTEGER DEFAULT 0,
+    channels_joined INTEGER DEFAULT 0,
+    last_daily_reward TEXT,
+    referred_by INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS channels (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    type TEXT NOT NULL CHECK (type IN ('normal', 'vip', 'order')),
+    target INTEGER NOT NULL,
+    gained INTEGER DEFAULT 0,
+    initial_count INTEGER DEFAULT 0,
+    current_count INTEGER DEFAULT 0,
+    active BOOLEAN DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    order_id INTEGER,
+    FOREIGN KEY (order_id) REFERENCES orders (id)
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    channel_username TEXT NOT NULL,
+    members_count INTEGER NOT NULL,
+    points_cost INTEGER NOT NULL,
+    status TEXT DEFAULT 'active' CHECK (status IN ('active', 'completed', 'cancelled')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+CREATE TABLE IF NOT EXISTS codes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    code TEXT UNIQUE NOT NULL,
+    points INTEGER NOT NULL,
+    usage_limit INTEGER NOT NULL,
+    used_count INTEGER DEFAULT 0,
+    active BOOLEAN DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS code_usage (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    code_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (code_id) REFERENCES codes (id),
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    UNIQUE (code_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS user_channel_subscriptions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    channel_username TEXT NOT NULL,
+    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    UNIQUE (user_id, channel_username)
+);
+
+CREATE TABLE IF NOT EXISTS banned_users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    username TEXT,
+    banned_by INTEGER NOT NULL,
+    ban_reason TEXT DEFAULT 'Manual ban',
+    banned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (banned_by) REFERENCES users (id)
+);
+
+CREATE TABLE IF NOT EXISTS mandatory_channels (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel_username TEXT UNIQUE NOT NULL,
+    channel_title TEXT,
+    channel_link TEXT,
+    added_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    active INTEGER DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS channel_leavers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    channel_username TEXT NOT NULL,
+    left_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    previously_subscribed BOOLEAN DEFAULT 0,
+    penalty_applied BOOLEAN DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    UNIQUE (user_id, channel_username)
+);
+
+CREATE TABLE IF NOT EXISTS special_content (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_title TEXT NOT NULL,
+    content_message TEXT NOT NULL,
+    target_channel TEXT,
+    is_active BOOLEAN DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_channels_username ON channels (username);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status);
+CREATE INDEX IF NOT EXISTS idx_channel_leavers_user ON channel_leavers (user_id);
+CREATE INDEX IF NOT EXISTS idx_channel_leavers_channel ON channel_leavers (channel_username);
+CREATE INDEX IF NOT EXISTS idx_ucs_channel ON user_channel_subscriptions (channel_username, user_id);
+CREATE INDEX IF NOT EXISTS idx_users_username ON users (username);
+CREATE INDEX IF NOT EXISTS idx_orders_user_status ON orders (user_id, status);
+CREATE INDEX IF NOT EXISTS idx_channels_type_active ON channels (active, type);
+-- Lets the COLLATE NOCASE username lookup probe instead of scan; the
+-- plain idx_users_username only serves binary-collated comparisons
+CREATE INDEX IF NOT EXISTS idx_users_username_nocase ON users (username COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_mandatory_active_added ON mandatory_channels (active, added_at);
+
+-- Redundant indexes from earlier versions: the rowid primary key already
+-- indexes users.id, and the composite (user_id, status) / (active, type)
+-- indexes cover the dropped single-column ones by prefix
+DROP INDEX IF EXISTS idx_users_id;
+DROP INDEX IF EXISTS idx_orders_user_id;
+DROP INDEX IF EXISTS idx_channels_active;
+
+COMMIT;
+"""
+
+# Columns added after the original schema shipped; applied only when a
+# PRAGMA table_info probe says they are missing
+_SCHEMA_UPGRADES = {
+    'channels': (
+        ('initial_count', 'INTEGER DEFAULT 0'),
+        ('current_count', 'INTEGER DEFAULT 0'),
+    ),
+    'users': (
+        ('is_banned', 'INTEGER DEFAULT 0'),
+        ('banned_reason', 'TEXT'),
+        ('banned_at', 'TEXT'),
+        ('blocked', 'INTEGER DEFAULT 0'),
+    ),
+}
+
+# Hot single-row lookups as shared literals so every call presents the
+# identical SQL string to sqlite3's per-connection statement cache
+_SQL_GET_USER = 'SELECT * FROM users WHERE id = ?'
+_SQL_GET_USER_POINTS = 'SELECT points FROM users WHERE id = ?'
+_SQL_IS_BANNED = 'SELECT is_banned FROM users WHERE id = ?'
+_SQL_LAST_DAILY = 'SELECT last_daily_reward FROM users WHERE id = ?'
+
+# Registration / subscription path: runs on every /start and channel join
+_SQL_ADD_USER = '''
+    INSERT INTO users (id, username, first_name, referred_by)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (id) DO NOTHING
+    RETURNING id
+'''
+_SQL_BUMP_REFERRALS = 'UPDATE users SET referrals = referrals + 1 WHERE id = ?'
+_SQL_ADD_SUBSCRIPTION = '''
+    INSERT INTO user_channel_subscriptions (user_id, channel_username)
+    VALUES (?, ?)
+    ON CONFLICT (user_id, channel_username) DO NOTHING
+    RETURNING id
+'''
+_SQL_AWARD_JOIN_POINTS = '''
+    UPDATE users
+    SET points = points + ?, channels_joined = channels_joined + 1
+    WHERE id = ?
+'''
+
+# Code redemption and order/mandatory-channel lookups, shared for the
+# same statement-cache reason as the user lookups above
+_SQL_CODE_LOOKUP = '''
+    SELECT id FROM codes WHERE code = ? AND active = 1
+'''
+_SQL_RECORD_CODE_USE = '''
+    INSERT INTO code_usage (code_id, user_id)
+    SELECT id, ? FROM codes WHERE code = ? AND active = 1
+    ON CONFLICT (code_id, user_id) DO NOTHING
+    RETURNING code_id
+'''
+_SQL_CLAIM_CODE_SLOT = '''
+    UPDATE codes
+    SET used_count = used_count + 1
+    WHERE id = ? AND used_count < usage_limit
+    RETURNING points
+'''
+_SQL_AWARD_POINTS = 'UPDATE users SET points = points + ? WHERE id = ?'
+# get_orders has only four filter combinations, so each gets its own
+# constant instead of assembling WHERE clauses per call
+_SQL_ORDERS_ALL = '''
+    SELECT o.*, u.username, u.first_name
+    FROM orders o
+    LEFT JOIN users u ON o.user_id = u.id
+    ORDER BY o.created_at DESC
+'''
+_SQL_ORDERS_BY_STATUS = _SQL_ORDERS_ALL.replace(
+    'ORDER BY', 'WHERE o.status = ? ORDER BY')
+_SQL_ORDERS_BY_USER = _SQL_ORDERS_ALL.replace(
+    'ORDER BY', 'WHERE o.user_id = ? ORDER BY')
+_SQL_ORDERS_BY_STATUS_USER = _SQL_ORDERS_ALL.replace(
+    'ORDER BY', 'WHERE o.status = ? AND o.user_id = ? ORDER BY')
+_SQL_GET_ORDER_INFO = '''
+    SELECT o.*, u.username, u.first_name, u.id as owner_id
+    FROM orders o
+    LEFT JOIN users u ON o.user_id = u.id
+    WHERE o.id = ?
+'''
+_SQL_GET_STATS = '''
+    SELECT (SELECT COUNT(*) FROM users),
+           (SELECT COUNT(*) FROM channels WHERE active = 1),
+           (SELECT COALESCE(SUM(points), 0) FROM users),
+           (SELECT COUNT(*) FROM orders WHERE status = 'active')
+'''
+_SQL_MISSING_MANDATORY = '''
+    SELECT mc.channel_username, mc.channel_title, mc.channel_link
+    FROM mandatory_channels mc
+    LEFT JOIN user_channel_subscriptions ucs
+        ON mc.channel_username = ucs.channel_username AND ucs.user_id = ?
+    WHERE mc.active = 1 AND ucs.id IS NULL
+'''
+
+# One-statement add-or-reactivate for channels; replaces the old
+# SELECT-then-INSERT-or-UPDATE dance
+_SQL_UPSERT_CHANNEL = '''
+    INSERT INTO channels (username, type, target, order_id, initial_count, current_count, gained, active)
+    VALUES (?, ?, ?, ?, 0, 0, 0, 1)
+    ON CONFLICT(username) DO UPDATE SET
+        active = 1, type = excluded.type, target = excluded.target,
+        gained = 0, current_count = 0, order_id = excluded.order_id
+'''
+
+
+def _strip_at(username: str) -> str:
+    """Drop a leading @ from a Telegram username
+
+    The common case has no @ at all; the startswith check avoids the
+    full scan and fresh allocation .replace() pays every time.
+    """
+    return username[1:] if username.startswith('@') else username
+
 class Database:
     def __init__(self, db_path: str):
         self.db_path = db_path
         self.local = threading.local()
+        # Every connection ever handed out, so close() can shut them all;
+        # guarded because to_thread workers may open theirs concurrently
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._channels_cache = {}  # channel_type -> (timestamp, rows)
+        self._special_cache = {}  # target_channel -> (timestamp, rows)
+        self._stats_cache = (0.0, None)  # (timestamp, stats dict)
+        # Bumped on every content mutation so renderers can key caches on it
+        self.special_content_version = 0
         self.init_database()
+        # Seeded once so new-user notifications do not COUNT(*) per signup;
+        # add_user keeps it in step
+        self.total_users = self._count_users_once()
+
+    def _count_users_once(self) -> int:
+        """One-time COUNT(*) to seed the in-memory user counter"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM users')
+        return cursor.fetchone()[0]
     
     def get_connection(self):
         if not hasattr(self.local, 'connection'):
-            self.local.connection = sqlite3.connect(self.db_path)
-            self.local.connection.row_factory = sqlite3.Row
+            # Larger statement cache: the handful of hot single-row
+            # queries should always hit their compiled form
+            # detect_types=0 (explicit): timestamps are stored as ISO text
+            # and parsed with datetime.fromisoformat where needed, so the
+            # adapter/converter machinery never has to run on binds
+            # check_same_thread=False so close() can shut connections
+            # opened on to_thread workers; threading.local still keeps
+            # each connection on a single thread during normal use
+            connection = sqlite3.connect(self.db_path, detect_types=0,
+                                         cached_statements=256, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            self._configure_connection(connection)
+            with self._connections_lock:
+                self._connections.append(connection)
+            self.local.connection = connection
         return self.local.connection
+
+    def close(self):
+        """Close every connection this Database has opened (shutdown only)"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.close()
+            except sqlite3.Error as e:
+                logging.error("Failed to close database connection: %s", e)
+        # Drop the calling thread's cached handle so a later use reopens
+        if hasattr(self.local, 'connection'):
+            del self.local.connection
+
+    @staticmethod
+    def _rows_to_dicts(cursor) -> List[Dict]:
+        """Materialize a cursor's remaining rows as plain dicts
+
+        Callers rely on dict semantics (.get, mutation), so rows are
+        converted once here at the API boundary rather than handing out
+        sqlite3.Row objects.
+
+        Rows are drained in fetchmany batches so only one batch of Row
+        objects is alive at a time; fetchall would hold the whole result
+        set twice while the dicts are built.
+        """
+        rows = []
+        while batch := cursor.fetchmany(256):
+            rows.extend(dict(row) for row in batch)
+        return rows
+
+    @staticmethod
+    def _configure_connection(conn):
+        """Per-connection PRAGMAs, applied once when a connection is opened
+
+        WAL lets membership-check reads proceed while points are being
+        written; NORMAL sync is safe with WAL and skips an fsync per
+        commit; temp tables and sorts stay off disk.
+        """
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.execute('PRAGMA busy_timeout=5000')
+        # ~20MB page cache; negative means KiB
+        cursor.execute('PRAGMA cache_size=-20000')
+        # Memory-map up to 256MiB of the DB file so page reads come from
+        # the OS page cache instead of a pread() syscall per page
+        cursor.execute('PRAGMA mmap_size=268435456')
+        cursor.execute('PRAGMA foreign_keys=ON')
     
     def init_database(self):
         """Initialize database with all required tables"""
         conn = sqlite3.connect(self.db_path)
+        self._configure_connection(conn)
+
+        # All CREATEs run in one transaction (one fsync on cold start)
+        conn.executescript(_SCHEMA_DDL)
+
+        # Upgrade columns for databases created by older versions
         cursor = conn.cursor()
-        
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY,
-                username TEXT,
-                first_name TEXT,
-                points INTEGER DEFAULT 0,
-                referrals INTEGER DEFAULT 0,
-                channels_joined INTEGER DEFAULT 0,
-                last_daily_reward TEXT,
-                referred_by INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Channels table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS channels (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                type TEXT NOT NULL CHECK (type IN ('normal', 'vip', 'order')),
-                target INTEGER NOT NULL,
-                gained INTEGER DEFAULT 0,
-                initial_count INTEGER DEFAULT 0,
-                current_count INTEGER DEFAULT 0,
-                active BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                order_id INTEGER,
-                FOREIGN KEY (order_id) REFERENCES orders (id)
-            )
-        ''')
-        
-        # Add missing columns for existing databases
-        try:
-            cursor.execute('ALTER TABLE channels ADD COLUMN initial_count INTEGER DEFAULT 0')
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        try:
-            cursor.execute('ALTER TABLE channels ADD COLUMN current_count INTEGER DEFAULT 0')
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        # Add ban system to users table
-        try:
-            cursor.execute('ALTER TABLE users ADD COLUMN is_banned INTEGER DEFAULT 0')
-        except sqlite3.OperationalError:
-            pass
-        
-        try:
-            cursor.execute('ALTER TABLE users ADD COLUMN banned_reason TEXT')
-        except sqlite3.OperationalError:
-            pass
-        
-        try:
-            cursor.execute('ALTER TABLE users ADD COLUMN banned_at TEXT')
-        except sqlite3.OperationalError:
-            pass
-        
-        # Orders table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                channel_username TEXT NOT NULL,
-                members_count INTEGER NOT NULL,
-                points_cost INTEGER NOT NULL,
-                status TEXT DEFAULT 'active' CHECK (status IN ('active', 'completed', 'cancelled')),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                completed_at TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Redemption codes table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS codes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                code TEXT UNIQUE NOT NULL,
-                points INTEGER NOT NULL,
-                usage_limit INTEGER NOT NULL,
-                used_count INTEGER DEFAULT 0,
-                active BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Code usage tracking
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS code_usage (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                code_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (code_id) REFERENCES codes (id),
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                UNIQUE (code_id, user_id)
-            )
-        ''')
-        
-        # User channel subscriptions tracking
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_channel_subscriptions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                channel_username TEXT NOT NULL,
-                joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                UNIQUE (user_id, channel_username)
-            )
-        ''')
-        
-        # Banned users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS banned_users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                username TEXT,
-                banned_by INTEGER NOT NULL,
-                ban_reason TEXT DEFAULT 'Manual ban',
-                banned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (banned_by) REFERENCES users (id)
+        alters = []
+        for table, columns in _SCHEMA_UPGRADES.items():
+            cursor.execute(f'PRAGMA table_info({table})')
+            existing = {row[1] for row in cursor.fetchall()}
+            alters.extend(
+                f'ALTER TABLE {table} ADD COLUMN {name} {definition}'
+                for name, definition in columns if name not in existing
             )
-        ''')
-        
-        # Create mandatory channels table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS mandatory_channels (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            channel_username TEXT UNIQUE NOT NULL,
-            channel_title TEXT,
-            channel_link TEXT,
-            added_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            active INTEGER DEFAULT 1
-        )''')
-
-        # Create channel leavers table to track users who left or never subscribed
-        cursor.execute('''CREATE TABLE IF NOT EXISTS channel_leavers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            channel_username TEXT NOT NULL,
-            left_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            previously_subscribed BOOLEAN DEFAULT 0,
-            penalty_applied BOOLEAN DEFAULT 0,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            UNIQUE (user_id, channel_username)
-        )''')
-
-        # Create special content table for leavers
-        cursor.execute('''CREATE TABLE IF NOT EXISTS special_content (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            content_title TEXT NOT NULL,
-            content_message TEXT NOT NULL,
-            target_channel TEXT,
-            is_active BOOLEAN DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )''')
-
-        # Create indexes for better performance
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_id ON users (id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_channels_active ON channels (active)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders (user_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_channel_leavers_user ON channel_leavers (user_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_channel_leavers_channel ON channel_leavers (channel_username)')
-        
-        conn.commit()
+        if alters:
+            conn.executescript('BEGIN;\n' + ';\n'.join(alters) + ';\nCOMMIT;')
+
+        # Refresh planner statistics so the covering indexes get picked
+        conn.execute('ANALYZE')
+
         conn.close()
         logging.info("Database initialized successfully")
     
@@ -196,17 +391,20 @@ class Database:
         cursor = conn.cursor()
         
         try:
-            cursor.execute('''
-                INSERT OR IGNORE INTO users (id, username, first_name, referred_by) 
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, username, first_name, referred_by))
-            
-            if cursor.rowcount > 0 and referred_by:
+            inserted = cursor.execute(
+                _SQL_ADD_USER, (user_id, username, first_name, referred_by)
+            ).fetchone()
+
+            if inserted and referred_by:
                 # Increment referral count for the referrer
-                cursor.execute('UPDATE users SET referrals = referrals + 1 WHERE id = ?', (referred_by,))
-            
+                cursor.execute(_SQL_BUMP_REFERRALS, (referred_by,))
+
             conn.commit()
-            return cursor.rowcount > 0
+            if inserted:
+                self.total_users += 1
+                self._invalidate_stats_cache()
+                return True
+            return False
         except Exception as e:
             logging.error(f"Error adding user: {e}")
             return False
@@ -214,14 +412,13 @@ class Database:
     def update_user_username(self, user_id: int, username: str):
         """Update user's username"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            cursor.execute(
-                'UPDATE users SET username = ? WHERE id = ?',
-                (username, user_id)
-            )
-            conn.commit()
+            with conn:
+                cursor = conn.execute(
+                    'UPDATE users SET username = ? WHERE id = ?',
+                    (username, user_id)
+                )
             return cursor.rowcount > 0
         except Exception as e:
             logging.error(f"Error updating user username: {e}")
@@ -230,37 +427,33 @@ class Database:
     def get_user(self, user_id: int) -> Optional[Dict]:
         """Get user information"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-        result = cursor.fetchone()
+        result = conn.execute(_SQL_GET_USER, (user_id,)).fetchone()
         return dict(result) if result else None
     
+    def get_user_points(self, user_id: int) -> Optional[int]:
+        """Get just the points balance, skipping the full-row fetch"""
+        conn = self.get_connection()
+        result = conn.execute(_SQL_GET_USER_POINTS, (user_id,)).fetchone()
+        return result[0] if result else None
+    
     def update_user_points(self, user_id: int, points: int):
         """Update user points (can be positive or negative)"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('UPDATE users SET points = points + ? WHERE id = ?', (points, user_id))
-        conn.commit()
+        with conn:
+            cursor = conn.execute('UPDATE users SET points = points + ? WHERE id = ?', (points, user_id))
         return cursor.rowcount > 0
     
     def set_user_points(self, user_id: int, points: int):
         """Set user points to a specific value"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('UPDATE users SET points = ? WHERE id = ?', (points, user_id))
-        conn.commit()
+        with conn:
+            cursor = conn.execute('UPDATE users SET points = ? WHERE id = ?', (points, user_id))
         return cursor.rowcount > 0
     
     def can_claim_daily_reward(self, user_id: int) -> bool:
         """Check if user can claim daily reward"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT last_daily_reward FROM users WHERE id = ?', (user_id,))
-        result = cursor.fetchone()
+        result = conn.execute(_SQL_LAST_DAILY, (user_id,)).fetchone()
         
         if not result or not result[0]:
             return True
@@ -269,20 +462,23 @@ class Database:
         return datetime.now() - last_reward >= timedelta(days=1)
     
     def claim_daily_reward(self, user_id: int, points: int) -> bool:
-        """Claim daily reward"""
-        if not self.can_claim_daily_reward(user_id):
-            return False
-        
+        """Claim daily reward
+
+        A single guarded UPDATE: the WHERE clause repeats the eligibility
+        check so two concurrent clicks cannot both claim, and the read
+        round-trip of the old precheck is gone. ISO timestamps compare
+        correctly as strings.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
-        
-        now = datetime.now().isoformat()
+
+        now = datetime.now()
         cursor.execute('''
-            UPDATE users 
-            SET points = points + ?, last_daily_reward = ? 
-            WHERE id = ?
-        ''', (points, now, user_id))
-        
+            UPDATE users
+            SET points = points + ?, last_daily_reward = ?
+            WHERE id = ? AND (last_daily_reward IS NULL OR last_daily_reward <= ?)
+        ''', (points, now.isoformat(), user_id, (now - timedelta(days=1)).isoformat()))
+
         conn.commit()
         return cursor.rowcount > 0
     
@@ -291,133 +487,184 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        uname = _strip_at(username)
         try:
-            # First check if channel exists
-            cursor.execute('SELECT id, active FROM channels WHERE username = ?', (username.replace('@', ''),))
-            existing = cursor.fetchone()
-            
-            if existing:
-                # Channel exists - reactivate it with new settings
-                # Clear all existing subscriptions for fresh start
-                cursor.execute('''
-                    DELETE FROM user_channel_subscriptions 
-                    WHERE channel_username = ?
-                ''', (username.replace('@', ''),))
-                
-                cursor.execute('''
-                    UPDATE channels 
-                    SET active = 1, type = ?, target = ?, gained = 0, current_count = 0, order_id = ?
-                    WHERE username = ?
-                ''', (channel_type, target, order_id, username.replace('@', '')))
-                logging.info(f"✅ Reactivated existing channel @{username} with target {target} - cleared old subscriptions")
-                conn.commit()
-                return True
-            else:
-                # New channel - insert it
-                cursor.execute('''
-                    INSERT INTO channels (username, type, target, order_id, initial_count, current_count, gained, active) 
-                    VALUES (?, ?, ?, ?, 0, 0, 0, 1)
-                ''', (username.replace('@', ''), channel_type, target, order_id))
-                logging.info(f"✅ Added new channel @{username} with target {target}")
-                conn.commit()
-                return True
+            # Clear any old subscriptions for a fresh start, then insert or
+            # reactivate in a single upsert; both land in one commit
+            cursor.execute('''
+                DELETE FROM user_channel_subscriptions
+                WHERE channel_username = ?
+            ''', (uname,))
+            cursor.execute(_SQL_UPSERT_CHANNEL, (uname, channel_type, target, order_id))
+            conn.commit()
+            logging.info("✅ Added or reactivated channel @%s with target %d - cleared old subscriptions", uname, target)
+            self._invalidate_channels_cache()
+            return True
         except Exception as e:
+            conn.rollback()
             logging.error(f"Error adding/updating channel: {e}")
             return False
     
+    def add_channels_bulk(self, channels: List[tuple]) -> bool:
+        """Add or reactivate many channels in one transaction
+
+        channels is a list of (username, channel_type, target, order_id)
+        tuples. One commit covers every subscription clear and upsert
+        instead of one fsync per channel.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        rows = [
+            (username[1:] if username.startswith('@') else username,
+             channel_type, target, order_id)
+            for username, channel_type, target, order_id in channels
+        ]
+        try:
+            cursor.executemany('''
+                DELETE FROM user_channel_subscriptions
+                WHERE channel_username = ?
+            ''', [(row[0],) for row in rows])
+            cursor.executemany(_SQL_UPSERT_CHANNEL, rows)
+            conn.commit()
+            logging.info("✅ Added or reactivated %d channels in bulk", len(rows))
+            self._invalidate_channels_cache()
+            return True
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error bulk adding channels: {e}")
+            return False
+
     def remove_channel(self, username: str) -> bool:
         """Remove a channel"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('DELETE FROM channels WHERE username = ?', (username.replace('@', ''),))
+        cursor.execute('DELETE FROM channels WHERE username = ?', (_strip_at(username),))
         conn.commit()
+        self._invalidate_channels_cache()
         return cursor.rowcount > 0
     
-    def get_active_channels(self, channel_type: str = None) -> List[Dict]:
-        """Get all active channels"""
+    def _invalidate_channels_cache(self):
+        """Drop cached channel lists after any channel mutation
+
+        Channel mutations also shift the channel/order counts, so the
+        stats cache goes with them.
+        """
+        self._channels_cache.clear()
+        self._invalidate_stats_cache()
+
+    def get_active_channels(self, channel_type: str = None, limit: int = None, offset: int = 0) -> List[Dict]:
+        """Get active channels, optionally limited database-side
+
+        Unlimited reads (the hot path for the channel list buttons) are
+        cached for a few seconds per channel_type; every channel mutation
+        calls _invalidate_channels_cache.
+        """
+        if limit is None:
+            entry = self._channels_cache.get(channel_type)
+            if entry and time.monotonic() - entry[0] < ACTIVE_CHANNELS_CACHE_TTL:
+                return entry[1]
+
         conn = self.get_connection()
         cursor = conn.cursor()
-        
+
         if channel_type:
-            cursor.execute('SELECT * FROM channels WHERE active = 1 AND type = ?', (channel_type,))
+            query = 'SELECT * FROM channels WHERE active = 1 AND type = ?'
+            params = [channel_type]
         else:
-            cursor.execute('SELECT * FROM channels WHERE active = 1')
-        
-        return [dict(row) for row in cursor.fetchall()]
-    
+            query = 'SELECT * FROM channels WHERE active = 1'
+            params = []
+
+        if limit is not None:
+            query += ' ORDER BY id DESC LIMIT ? OFFSET ?'
+            params.extend((limit, offset))
+
+        cursor.execute(query, params)
+        rows = self._rows_to_dicts(cursor)
+        if limit is None:
+            self._channels_cache[channel_type] = (time.monotonic(), rows)
+        return rows
+
+    def get_channel_by_username(self, username: str) -> Optional[Dict]:
+        """Get a single active channel by username (indexed lookup)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            'SELECT * FROM channels WHERE username = ? AND active = 1 LIMIT 1',
+            (_strip_at(username),)
+        )
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
     def update_channel_members(self, username: str, current_count: int = 0):
-        """Update channel member count based ONLY on bot subscriptions - intelligent counting"""
+        """Update channel member count based ONLY on bot subscriptions - intelligent counting
+
+        The recount, channel update and any order completion commit as one
+        transaction instead of one per statement.
+        """
+        uname = _strip_at(username)
         conn = self.get_connection()
         cursor = conn.cursor()
-        
-        # Get channel info 
+
+        # Get channel info
         cursor.execute('''
-            SELECT id, target, order_id 
-            FROM channels 
+            SELECT id, target, order_id
+            FROM channels
             WHERE username = ? AND active = 1
-        ''', (username.replace('@', ''),))
-        
+        ''', (uname,))
+
         channel_info = cursor.fetchone()
         if not channel_info:
             return False, None
-        
+
         channel_id, target, order_id = channel_info
-        
-        # SMART COUNTING: Only count verified real users who went through proper bot workflow
-        # Get number of users who joined this channel via the bot AND are still subscribed
-        # Get order owner to exclude them from the count
-        order_owner_id = 8117492678  # Default admin as owner
-        if order_id:
-            cursor.execute('SELECT user_id FROM orders WHERE id = ?', (order_id,))
-            owner_result = cursor.fetchone()
-            if owner_result:
-                order_owner_id = owner_result[0]
-        
+
+        # SMART COUNTING: Only count verified real users who went through
+        # proper bot workflow AND are still subscribed, excluding the order
+        # owner (resolved inline; default admin when there is no order row).
+        # Served by idx_ucs_channel, no join to users needed.
         cursor.execute('''
-            SELECT COUNT(*) FROM user_channel_subscriptions ucs
-            INNER JOIN users u ON ucs.user_id = u.id
-            WHERE ucs.channel_username = ? 
-            AND u.id != ?
-        ''', (username.replace('@', ''), order_owner_id))
-        
+            SELECT COUNT(*) FROM user_channel_subscriptions
+            WHERE channel_username = ?
+            AND user_id != COALESCE((SELECT user_id FROM orders WHERE id = ?), 8117492678)
+        ''', (uname, order_id))
+
         gained_members = cursor.fetchone()[0]
-        
+
         # Log the count for debugging
-        logging.info(f"📊 Channel @{username}: {gained_members} verified real members from bot purchases")
-        
-        # Update gained members (this is the TRUE count from bot purchases)
+        logging.info("📊 Channel @%s: %d verified real members from bot purchases", uname, gained_members)
+
+        # Update gained members (the TRUE count from bot purchases) and
+        # deactivate in the same statement once the target is met
         cursor.execute('''
-            UPDATE channels 
-            SET gained = ?, current_count = ? 
+            UPDATE channels
+            SET gained = ?, current_count = ?,
+                active = CASE WHEN ? >= target THEN 0 ELSE active END
             WHERE id = ?
-        ''', (gained_members, gained_members, channel_id))
-        
+        ''', (gained_members, gained_members, gained_members, channel_id))
+
         # Check if target reached
         if gained_members >= target:
-            # Deactivate channel and complete order if exists
-            cursor.execute('UPDATE channels SET active = 0 WHERE id = ?', (channel_id,))
-            
             order_owner_id = None
             if order_id:  # order_id exists
-                # Get order owner information
                 cursor.execute('''
-                    SELECT user_id FROM orders WHERE id = ?
+                    UPDATE orders
+                    SET status = 'completed', completed_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                    RETURNING user_id
                 ''', (order_id,))
                 order_result = cursor.fetchone()
                 if order_result:
                     order_owner_id = order_result[0]
-                
-                cursor.execute('''
-                    UPDATE orders 
-                    SET status = 'completed', completed_at = CURRENT_TIMESTAMP 
-                    WHERE id = ?
-                ''', (order_id,))
-            
+
             conn.commit()
+            self._invalidate_channels_cache()
             return True, order_owner_id
-        
+
         conn.commit()
+        self._invalidate_channels_cache()
         return False, None
     
     def get_available_channels_for_user(self, user_id: int) -> List[Dict]:
@@ -432,30 +679,86 @@ class Database:
             AND c.type IN ('normal', 'vip')
         ''')
         
-        return [dict(row) for row in cursor.fetchall()]
+        return self._rows_to_dicts(cursor)
     
+    def get_channels_not_subscribed_by_user(self, user_id: int, channel_type: str = None) -> List[Dict]:
+        """Active channels the user has no subscription record for (set difference in SQL)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        query = '''
+            SELECT c.* FROM channels c
+            LEFT JOIN user_channel_subscriptions ucs
+                ON ucs.channel_username = c.username AND ucs.user_id = ?
+            WHERE c.active = 1 AND ucs.user_id IS NULL
+        '''
+        params = [user_id]
+        if channel_type:
+            query += ' AND c.type = ?'
+            params.append(channel_type)
+
+        cursor.execute(query, params)
+        return self._rows_to_dicts(cursor)
+
+    def get_channels_with_subscription_flag(self, user_id: int, channel_type: str = None) -> List[Dict]:
+        """Active channels annotated with a 'subscribed' flag for this user
+
+        One joined query replaces the get_active_channels +
+        get_user_subscriptions pair.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        query = '''
+            SELECT c.*, CASE WHEN ucs.user_id IS NOT NULL THEN 1 ELSE 0 END AS subscribed
+            FROM channels c
+            LEFT JOIN user_channel_subscriptions ucs
+                ON ucs.channel_username = c.username AND ucs.user_id = ?
+            WHERE c.active = 1
+        '''
+        params = [user_id]
+        if channel_type:
+            query += ' AND c.type = ?'
+            params.append(channel_type)
+
+        cursor.execute(query, params)
+        return self._rows_to_dicts(cursor)
+
+    def get_subscribed_active_channels(self, user_id: int, channel_type: str = None) -> List[Dict]:
+        """Active channels the user has a subscription record for"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        query = '''
+            SELECT c.* FROM channels c
+            INNER JOIN user_channel_subscriptions ucs
+                ON ucs.channel_username = c.username AND ucs.user_id = ?
+            WHERE c.active = 1
+        '''
+        params = [user_id]
+        if channel_type:
+            query += ' AND c.type = ?'
+            params.append(channel_type)
+
+        cursor.execute(query, params)
+        return self._rows_to_dicts(cursor)
+
     def get_channel_subscribers(self, channel_username: str) -> List[int]:
         """Get list of users who joined this channel"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        cursor = conn.execute('''
             SELECT user_id FROM user_channel_subscriptions 
             WHERE channel_username = ?
-        ''', (channel_username.replace('@', ''),))
-        
+        ''', (_strip_at(channel_username),))
         return [row[0] for row in cursor.fetchall()]
     
     def get_user_subscriptions(self, user_id: int) -> List[str]:
         """Get list of channels this user is subscribed to"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        cursor = conn.execute('''
             SELECT channel_username FROM user_channel_subscriptions 
             WHERE user_id = ?
         ''', (user_id,))
-        
         return [row[0] for row in cursor.fetchall()]
     
     def user_joined_channel(self, user_id: int, channel_username: str, points: int) -> bool:
@@ -465,23 +768,19 @@ class Database:
         
         try:
             # Record the subscription
-            cursor.execute('''
-                INSERT OR IGNORE INTO user_channel_subscriptions (user_id, channel_username) 
-                VALUES (?, ?)
-            ''', (user_id, channel_username.replace('@', '')))
-            
-            if cursor.rowcount > 0:  # New subscription
+            inserted = cursor.execute(
+                _SQL_ADD_SUBSCRIPTION, (user_id, _strip_at(channel_username))
+            ).fetchone()
+
+            if inserted:  # New subscription
                 # Award points and increment channels_joined count
-                cursor.execute('''
-                    UPDATE users 
-                    SET points = points + ?, channels_joined = channels_joined + 1 
-                    WHERE id = ?
-                ''', (points, user_id))
+                cursor.execute(_SQL_AWARD_JOIN_POINTS, (points, user_id))
                 
                 # Remove user from channel leavers if they were there
                 self.remove_channel_leaver(user_id, channel_username)
                 
                 conn.commit()
+                self._invalidate_channels_cache()
                 return True
             
             return False  # Already joined
@@ -489,19 +788,111 @@ class Database:
             logging.error(f"Error recording channel join: {e}")
             return False
     
-    def ban_user(self, user_id: int, reason: str = "Admin ban") -> bool:
-        """Ban a user from using the bot"""
+    def record_join_and_update(self, user_id: int, channel_username: str, points: int):
+        """Record a join, award points and recount the channel in one transaction
+
+        Fuses user_joined_channel + update_channel_members into a single
+        commit. Returns (success, completed, order_owner_id, gained, target);
+        order_owner_id is only set when the channel just completed, matching
+        the old two-call behaviour.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
-        
+        channel = _strip_at(channel_username)
+
         try:
             cursor.execute('''
-                UPDATE users 
-                SET is_banned = 1, banned_reason = ?, banned_at = ?
+                INSERT OR IGNORE INTO user_channel_subscriptions (user_id, channel_username)
+                VALUES (?, ?)
+            ''', (user_id, channel))
+
+            if cursor.rowcount == 0:  # Already joined
+                return False, False, None, 0, 0
+
+            cursor.execute('''
+                UPDATE users
+                SET points = points + ?, channels_joined = channels_joined + 1
                 WHERE id = ?
-            ''', (reason, datetime.now().isoformat(), user_id))
-            
+            ''', (points, user_id))
+
+            cursor.execute('''
+                DELETE FROM channel_leavers
+                WHERE user_id = ? AND channel_username = ?
+            ''', (user_id, channel))
+
+            cursor.execute('''
+                SELECT id, target, order_id
+                FROM channels
+                WHERE username = ? AND active = 1
+            ''', (channel,))
+            channel_info = cursor.fetchone()
+
+            if not channel_info:
+                conn.commit()
+                self._invalidate_channels_cache()
+                return True, False, None, 0, 0
+
+            channel_id, target, order_id = channel_info
+
+            # Smart counting: verified bot joins only, excluding the order owner
+            order_owner_id = 8117492678  # Default admin as owner
+            if order_id:
+                cursor.execute('SELECT user_id FROM orders WHERE id = ?', (order_id,))
+                owner_result = cursor.fetchone()
+                if owner_result:
+                    order_owner_id = owner_result[0]
+
+            cursor.execute('''
+                SELECT COUNT(*) FROM user_channel_subscriptions ucs
+                INNER JOIN users u ON ucs.user_id = u.id
+                WHERE ucs.channel_username = ?
+                AND u.id != ?
+            ''', (channel, order_owner_id))
+            gained = cursor.fetchone()[0]
+
+            cursor.execute('''
+                UPDATE channels
+                SET gained = ?, current_count = ?
+                WHERE id = ?
+            ''', (gained, gained, channel_id))
+
+            if gained >= target:
+                cursor.execute('UPDATE channels SET active = 0 WHERE id = ?', (channel_id,))
+                completed_owner_id = None
+                if order_id:
+                    cursor.execute('SELECT user_id FROM orders WHERE id = ?', (order_id,))
+                    order_result = cursor.fetchone()
+                    if order_result:
+                        completed_owner_id = order_result[0]
+                    cursor.execute('''
+                        UPDATE orders
+                        SET status = 'completed', completed_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    ''', (order_id,))
+
+                conn.commit()
+                self._invalidate_channels_cache()
+                return True, True, completed_owner_id, gained, target
+
             conn.commit()
+            self._invalidate_channels_cache()
+            return True, False, None, gained, target
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error recording channel join for @{channel}: {e}")
+            return False, False, None, 0, 0
+
+    def ban_user(self, user_id: int, reason: str = "Admin ban") -> bool:
+        """Ban a user from using the bot"""
+        conn = self.get_connection()
+        
+        try:
+            with conn:
+                cursor = conn.execute('''
+                    UPDATE users 
+                    SET is_banned = 1, banned_reason = ?, banned_at = ?
+                    WHERE id = ?
+                ''', (reason, datetime.now().isoformat(), user_id))
             return cursor.rowcount > 0
         except Exception as e:
             logging.error(f"Error banning user {user_id}: {e}")
@@ -510,37 +901,19 @@ class Database:
     def unban_user(self, user_id: int) -> bool:
         """Unban a user"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            cursor.execute('''
-                UPDATE users 
-                SET is_banned = 0, banned_reason = NULL, banned_at = NULL
-                WHERE id = ?
-            ''', (user_id,))
-            
-            conn.commit()
+            with conn:
+                cursor = conn.execute('''
+                    UPDATE users 
+                    SET is_banned = 0, banned_reason = NULL, banned_at = NULL
+                    WHERE id = ?
+                ''', (user_id,))
             return cursor.rowcount > 0
         except Exception as e:
             logging.error(f"Error unbanning user {user_id}: {e}")
             return False
     
-    def get_user_by_username(self, username: str) -> Optional[Dict]:
-        """Get user information by username"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                SELECT * FROM users WHERE username = ?
-            ''', (username,))
-            
-            result = cursor.fetchone()
-            return dict(result) if result else None
-        except Exception as e:
-            logging.error(f"Error getting user by username {username}: {e}")
-            return None
-    
     def get_ban_info(self, user_id: int) -> Optional[Dict]:
         """Get ban information for a user"""
         conn = self.get_connection()
@@ -561,11 +934,7 @@ class Database:
     def is_user_banned(self, user_id: int) -> bool:
         """Check if user is banned"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT is_banned FROM users WHERE id = ?', (user_id,))
-        result = cursor.fetchone()
-        
+        result = conn.execute(_SQL_IS_BANNED, (user_id,)).fetchone()
         return bool(result and result[0])
     
     def penalize_channel_leaver(self, user_id: int, channel_username: str, penalty_points: int):
@@ -573,51 +942,165 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        # Normalize once; this method references the name several times
+        channel = channel_username[1:] if channel_username.startswith('@') else channel_username
         try:
-            # Check if user was previously subscribed
-            cursor.execute('''
-                SELECT 1 FROM user_channel_subscriptions 
-                WHERE user_id = ? AND channel_username = ?
-            ''', (user_id, channel_username.replace('@', '')))
-            was_subscribed = cursor.fetchone() is not None
-            
-            # Remove subscription record
+            # Remove the subscription; RETURNING tells us in the same
+            # statement whether the user was actually subscribed
             cursor.execute('''
-                DELETE FROM user_channel_subscriptions 
+                DELETE FROM user_channel_subscriptions
                 WHERE user_id = ? AND channel_username = ?
-            ''', (user_id, channel_username.replace('@', '')))
-            
-            if cursor.rowcount > 0:  # User was subscribed
+                RETURNING 1
+            ''', (user_id, channel))
+
+            if cursor.fetchone():  # User was subscribed
+                # Apply the penalty (a 0-point subtract for stale-record
+                # cleanup) and decrement the channels count; negative
+                # balances are allowed
+                cursor.execute('''
+                    UPDATE users
+                    SET points = points - ?,
+                    channels_joined = channels_joined - 1
+                    WHERE id = ?
+                ''', (penalty_points, user_id))
                 if penalty_points > 0:
-                    # Penalize user by removing points (allow negative balance) and decrementing channels count
-                    cursor.execute('''
-                        UPDATE users 
-                        SET points = points - ?, 
-                        channels_joined = channels_joined - 1 
-                        WHERE id = ?
-                    ''', (penalty_points, user_id))
-                    logging.info(f"Penalized user {user_id} for leaving channel @{channel_username} (-{penalty_points} points)")
+                    logging.info("Penalized user %s for leaving channel @%s (-%d points)", user_id, channel, penalty_points)
                 else:
-                    # Just clean up the record without penalty (for users who returned externally)
-                    cursor.execute('''
-                        UPDATE users 
-                        SET channels_joined = channels_joined - 1 
-                        WHERE id = ?
-                    ''', (user_id,))
-                    logging.info(f"Cleaned up stale record for user {user_id} in channel @{channel_username}")
-                
-                # Add user to channel leavers table
+                    logging.info("Cleaned up stale record for user %s in channel @%s", user_id, channel)
+
+                # Add user to channel leavers table; a deleted row implies
+                # they were previously subscribed
                 cursor.execute('''
-                    INSERT OR REPLACE INTO channel_leavers 
-                    (user_id, channel_username, previously_subscribed, penalty_applied) 
-                    VALUES (?, ?, ?, ?)
-                ''', (user_id, channel_username.replace('@', ''), was_subscribed, penalty_points > 0))
-                
+                    INSERT OR REPLACE INTO channel_leavers
+                    (user_id, channel_username, previously_subscribed, penalty_applied)
+                    VALUES (?, ?, 1, ?)
+                ''', (user_id, channel, penalty_points > 0))
+
                 conn.commit()
-        
+
         except Exception as e:
+            conn.rollback()
             logging.error(f"Error penalizing channel leaver: {e}")
     
+    def _apply_leaver_penalties(self, cursor, user_ids: List[int], channel: str, penalty_points: int):
+        """Apply leaver penalties for one channel using the caller's transaction"""
+        for user_id in user_ids:
+            cursor.execute('''
+                DELETE FROM user_channel_subscriptions
+                WHERE user_id = ? AND channel_username = ?
+            ''', (user_id, channel))
+
+            if cursor.rowcount > 0:  # User was subscribed
+                cursor.execute('''
+                    UPDATE users
+                    SET points = points - ?,
+                    channels_joined = channels_joined - 1
+                    WHERE id = ?
+                ''', (penalty_points, user_id))
+
+                cursor.execute('''
+                    INSERT OR REPLACE INTO channel_leavers
+                    (user_id, channel_username, previously_subscribed, penalty_applied)
+                    VALUES (?, ?, ?, ?)
+                ''', (user_id, channel, True, penalty_points > 0))
+
+    def penalize_channel_leavers_bulk(self, user_ids: List[int], channel_username: str, penalty_points: int):
+        """Penalize many leavers of one channel under a single transaction"""
+        if not user_ids:
+            return
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        channel = _strip_at(channel_username)
+
+        try:
+            self._apply_leaver_penalties(cursor, user_ids, channel, penalty_points)
+            conn.commit()
+            logging.info("Penalized %d leavers of channel @%s (-%d points each)", len(user_ids), channel, penalty_points)
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error penalizing channel leavers in bulk: {e}")
+
+    def bulk_penalize_leavers(self, leavers_by_channel: Dict[str, List[int]], penalty_points: int):
+        """Penalize leavers across many channels under a single transaction"""
+        if not leavers_by_channel:
+            return
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            for channel_username, user_ids in leavers_by_channel.items():
+                self._apply_leaver_penalties(cursor, user_ids, _strip_at(channel_username), penalty_points)
+            conn.commit()
+            logging.info("Penalized leavers across %d channels (-%d points each)", len(leavers_by_channel), penalty_points)
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error penalizing channel leavers in bulk: {e}")
+
+    def update_all_channel_members(self, usernames: List[str]) -> List[str]:
+        """Recompute member counts for many channels in one pass
+
+        Returns the usernames of channels that reached their target; those
+        channels are deactivated and their orders completed, mirroring
+        update_channel_members.
+        """
+        if not usernames:
+            return []
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        names = [_strip_at(u) for u in usernames]
+        placeholders = ','.join('?' * len(names))
+
+        try:
+            cursor.execute(f'''
+                UPDATE channels
+                SET gained = (
+                    SELECT COUNT(*) FROM user_channel_subscriptions ucs
+                    WHERE ucs.channel_username = channels.username
+                    AND ucs.user_id != COALESCE(
+                        (SELECT user_id FROM orders WHERE id = channels.order_id),
+                        8117492678)
+                )
+                WHERE active = 1 AND username IN ({placeholders})
+            ''', names)
+            cursor.execute(f'''
+                UPDATE channels SET current_count = gained
+                WHERE active = 1 AND username IN ({placeholders})
+            ''', names)
+
+            cursor.execute(f'''
+                SELECT username, order_id FROM channels
+                WHERE active = 1 AND gained >= target AND username IN ({placeholders})
+            ''', names)
+            completed = cursor.fetchall()
+
+            if completed:
+                completed_names = [row[0] for row in completed]
+                done = ','.join('?' * len(completed_names))
+                cursor.execute(f'UPDATE channels SET active = 0 WHERE username IN ({done})', completed_names)
+
+                order_ids = [row[1] for row in completed if row[1]]
+                if order_ids:
+                    cursor.execute(f'''
+                        UPDATE orders
+                        SET status = 'completed', completed_at = CURRENT_TIMESTAMP
+                        WHERE id IN ({','.join('?' * len(order_ids))})
+                    ''', order_ids)
+
+                conn.commit()
+                self._invalidate_channels_cache()
+                return completed_names
+
+            conn.commit()
+            self._invalidate_channels_cache()
+            return []
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error updating channel members in bulk: {e}")
+            return []
+
     def add_channel_leaver(self, user_id: int, channel_username: str, previously_subscribed: bool = False):
         """Add user to channel leavers list (for users who never subscribed)"""
         conn = self.get_connection()
@@ -628,7 +1111,7 @@ class Database:
                 INSERT OR IGNORE INTO channel_leavers 
                 (user_id, channel_username, previously_subscribed, penalty_applied) 
                 VALUES (?, ?, ?, ?)
-            ''', (user_id, channel_username.replace('@', ''), previously_subscribed, False))
+            ''', (user_id, _strip_at(channel_username), previously_subscribed, False))
             
             conn.commit()
             return cursor.rowcount > 0
@@ -636,6 +1119,29 @@ class Database:
             logging.error(f"Error adding channel leaver: {e}")
             return False
     
+    def get_subscription_state(self, user_id: int) -> Dict:
+        """Subscriptions and leaver status for a user in one round-trip
+
+        Returns {'subscriptions': [...], 'is_leaver': bool}, replacing the
+        get_user_subscriptions + is_channel_leaver pair.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT
+                (SELECT GROUP_CONCAT(channel_username)
+                 FROM user_channel_subscriptions WHERE user_id = ?) AS subs,
+                EXISTS(SELECT 1 FROM channel_leavers WHERE user_id = ?) AS is_leaver
+        ''', (user_id, user_id))
+        row = cursor.fetchone()
+
+        subs = row['subs']
+        return {
+            'subscriptions': subs.split(',') if subs else [],
+            'is_leaver': bool(row['is_leaver'])
+        }
+
     def is_channel_leaver(self, user_id: int, channel_username: str = None) -> bool:
         """Check if user is a channel leaver (left or never subscribed)"""
         conn = self.get_connection()
@@ -646,7 +1152,7 @@ class Database:
                 cursor.execute('''
                     SELECT 1 FROM channel_leavers 
                     WHERE user_id = ? AND channel_username = ?
-                ''', (user_id, channel_username.replace('@', '')))
+                ''', (user_id, _strip_at(channel_username)))
             else:
                 cursor.execute('''
                     SELECT 1 FROM channel_leavers 
@@ -661,39 +1167,70 @@ class Database:
     def remove_channel_leaver(self, user_id: int, channel_username: str):
         """Remove user from channel leavers (when they resubscribe)"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            cursor.execute('''
-                DELETE FROM channel_leavers 
-                WHERE user_id = ? AND channel_username = ?
-            ''', (user_id, channel_username.replace('@', '')))
-            
-            conn.commit()
+            with conn:
+                cursor = conn.execute('''
+                    DELETE FROM channel_leavers 
+                    WHERE user_id = ? AND channel_username = ?
+                ''', (user_id, _strip_at(channel_username)))
             return cursor.rowcount > 0
         except Exception as e:
             logging.error(f"Error removing channel leaver: {e}")
             return False
     
+    # Shared SQL text: sqlite3 caches prepared statements per connection
+    # keyed on the exact string, so reusing one constant skips re-planning
+    _INSERT_SPECIAL_SQL = '''
+        INSERT INTO special_content (content_title, content_message, target_channel)
+        VALUES (?, ?, ?)
+    '''
+
     def add_special_content(self, title: str, message: str, target_channel: str = None) -> bool:
         """Add special content for channel leavers"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            cursor.execute('''
-                INSERT INTO special_content (content_title, content_message, target_channel) 
-                VALUES (?, ?, ?)
-            ''', (title, message, target_channel.replace('@', '') if target_channel else None))
+            cursor.execute(self._INSERT_SPECIAL_SQL,
+                           (title, message, _strip_at(target_channel) if target_channel else None))
             
             conn.commit()
+            self._special_cache.clear()
+            self.special_content_version += 1
             return True
         except Exception as e:
             logging.error(f"Error adding special content: {e}")
             return False
-    
+
+    def add_special_content_many(self, rows: List[tuple]) -> int:
+        """Insert many (title, message) special-content rows in one transaction"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.executemany(self._INSERT_SPECIAL_SQL,
+                               [(title, message, None) for title, message in rows])
+            conn.commit()
+            self._special_cache.clear()
+            self.special_content_version += 1
+            return cursor.rowcount
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error adding special content in bulk: {e}")
+            return 0
+
     def get_special_content(self, target_channel: str = None) -> List[Dict]:
-        """Get special content for channel leavers"""
+        """Get special content for channel leavers
+
+        Read-mostly data: results are cached for a few minutes and the
+        cache is cleared whenever content is added.
+        """
+        key = _strip_at(target_channel) if target_channel else None
+        entry = self._special_cache.get(key)
+        if entry and time.monotonic() - entry[0] < SPECIAL_CONTENT_CACHE_TTL:
+            return entry[1]
+
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -703,7 +1240,7 @@ class Database:
                     SELECT * FROM special_content 
                     WHERE is_active = 1 AND (target_channel = ? OR target_channel IS NULL)
                     ORDER BY created_at DESC
-                ''', (target_channel.replace('@', ''),))
+                ''', (_strip_at(target_channel),))
             else:
                 cursor.execute('''
                     SELECT * FROM special_content 
@@ -711,7 +1248,9 @@ class Database:
                     ORDER BY created_at DESC
                 ''')
             
-            return [dict(row) for row in cursor.fetchall()]
+            rows = self._rows_to_dicts(cursor)
+            self._special_cache[key] = (time.monotonic(), rows)
+            return rows
         except Exception as e:
             logging.error(f"Error getting special content: {e}")
             return []
@@ -721,6 +1260,7 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        uname = channel_username[1:] if channel_username.startswith('@') else channel_username
         try:
             # Deduct points from user
             cursor.execute('UPDATE users SET points = points - ? WHERE id = ?', (points_cost, user_id))
@@ -729,66 +1269,84 @@ class Database:
             cursor.execute('''
                 INSERT INTO orders (user_id, channel_username, members_count, points_cost) 
                 VALUES (?, ?, ?, ?)
-            ''', (user_id, channel_username.replace('@', ''), members_count, points_cost))
+            ''', (user_id, uname, members_count, points_cost))
             
             order_id = cursor.lastrowid
-            
-            # Add channel to channels table
-            self.add_channel(
-                username=channel_username,
-                channel_type='normal',
-                target=members_count,
-                order_id=order_id,
-                initial_count=initial_count
-            )
-            
+
+            # Add or reactivate the channel inside the same transaction;
+            # calling add_channel here would commit the half-done order
+            cursor.execute('''
+                DELETE FROM user_channel_subscriptions
+                WHERE channel_username = ?
+            ''', (uname,))
+            cursor.execute(_SQL_UPSERT_CHANNEL, (uname, 'normal', members_count, order_id))
+
             conn.commit()
+            self._invalidate_channels_cache()
             return order_id
-        
+
         except Exception as e:
+            conn.rollback()
             logging.error(f"Error creating order: {e}")
             return 0
-    
+
+    def create_channel_with_order(self, user_id: int, channel_username: str, channel_type: str, target: int, price: int = 0):
+        """Create an order and (re)activate its channel in one transaction
+
+        Returns (order_id, ok). A single commit replaces the separate
+        create_order + add_channel commits, so a crash can no longer leave
+        an orphan order without its channel.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        username = _strip_at(channel_username)
+
+        try:
+            # Deduct points from user (admins pass price 0)
+            cursor.execute('UPDATE users SET points = points - ? WHERE id = ?', (price, user_id))
+
+            cursor.execute('''
+                INSERT INTO orders (user_id, channel_username, members_count, points_cost)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, username, target, price))
+            order_id = cursor.lastrowid
+
+            # Add or reactivate the channel under the same transaction
+            cursor.execute('''
+                DELETE FROM user_channel_subscriptions
+                WHERE channel_username = ?
+            ''', (username,))
+            cursor.execute(_SQL_UPSERT_CHANNEL, (username, channel_type, target, order_id))
+
+            conn.commit()
+            self._invalidate_channels_cache()
+            return order_id, True
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error creating channel with order for @{username}: {e}")
+            return 0, False
+
     def get_orders(self, status: str = None, user_id: int = None) -> List[Dict]:
         """Get orders with optional filtering"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        query = '''
-            SELECT o.*, u.username, u.first_name 
-            FROM orders o 
-            LEFT JOIN users u ON o.user_id = u.id
-        '''
-        params = []
-        conditions = []
-        
-        if status:
-            conditions.append('o.status = ?')
-            params.append(status)
-        
-        if user_id:
-            conditions.append('o.user_id = ?')
-            params.append(user_id)
-        
-        if conditions:
-            query += ' WHERE ' + ' AND '.join(conditions)
-        
-        query += ' ORDER BY o.created_at DESC'
-        
-        cursor.execute(query, params)
-        return [dict(row) for row in cursor.fetchall()]
+        if status and user_id:
+            cursor.execute(_SQL_ORDERS_BY_STATUS_USER, (status, user_id))
+        elif status:
+            cursor.execute(_SQL_ORDERS_BY_STATUS, (status,))
+        elif user_id:
+            cursor.execute(_SQL_ORDERS_BY_USER, (user_id,))
+        else:
+            cursor.execute(_SQL_ORDERS_ALL)
+        return self._rows_to_dicts(cursor)
     
     def get_order_info(self, order_id: int) -> Optional[Dict]:
         """Get order information with user details"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT o.*, u.username, u.first_name, u.id as owner_id
-            FROM orders o 
-            LEFT JOIN users u ON o.user_id = u.id
-            WHERE o.id = ?
-        ''', (order_id,))
+        cursor.execute(_SQL_GET_ORDER_INFO, (order_id,))
         
         result = cursor.fetchone()
         return dict(result) if result else None
@@ -807,98 +1365,190 @@ class Database:
             return True
         except sqlite3.IntegrityError:
             return False
-    
+
+    def create_codes_bulk(self, rows: List[tuple]) -> int:
+        """Create many codes in one transaction; rows are (code, points, usage_limit)
+
+        Returns how many codes were actually inserted (duplicates are skipped).
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            before = conn.total_changes
+            cursor.executemany('''
+                INSERT OR IGNORE INTO codes (code, points, usage_limit)
+                VALUES (?, ?, ?)
+            ''', rows)
+            conn.commit()
+            return conn.total_changes - before
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error creating codes in bulk: {e}")
+            return 0
+
     def redeem_code(self, user_id: int, code: str) -> Optional[int]:
-        """Redeem a code and return points awarded"""
+        """Redeem a code and return points awarded
+
+        Runs as one BEGIN IMMEDIATE transaction so concurrent redeemers
+        cannot both claim the last usage slot: the usage row and the
+        used_count bump are guarded by the same write lock, and the
+        RETURNING clauses replace the old read-then-write probes.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
-        
+
         try:
-            # Get code info
-            cursor.execute('''
-                SELECT id, points, usage_limit, used_count 
-                FROM codes 
-                WHERE code = ? AND active = 1
-            ''', (code,))
-            
-            code_info = cursor.fetchone()
-            if not code_info:
+            cursor.execute('BEGIN IMMEDIATE')
+
+            # Record this user's usage; no row back means either an
+            # unknown code or a repeat redemption
+            cursor.execute(_SQL_RECORD_CODE_USE, (user_id, code))
+            usage = cursor.fetchone()
+            if not usage:
+                conn.rollback()
+                cursor.execute(_SQL_CODE_LOOKUP, (code,))
+                if cursor.fetchone():
+                    return -1  # Already used by this user
                 return None  # Invalid code
-            
-            code_id, points, usage_limit, used_count = code_info
-            
-            if used_count >= usage_limit:
+
+            # Claim a usage slot; fails once the limit is reached and
+            # rolls the usage row back with it
+            cursor.execute(_SQL_CLAIM_CODE_SLOT, (usage[0],))
+            claimed = cursor.fetchone()
+            if not claimed:
+                conn.rollback()
                 return None  # Code limit reached
-            
-            # Check if user already used this code
-            cursor.execute('''
-                SELECT id FROM code_usage 
-                WHERE code_id = ? AND user_id = ?
-            ''', (code_id, user_id))
-            
-            if cursor.fetchone():
-                return -1  # Already used by this user
-            
-            # Record usage and award points
-            cursor.execute('''
-                INSERT INTO code_usage (code_id, user_id) 
-                VALUES (?, ?)
-            ''', (code_id, user_id))
-            
-            cursor.execute('UPDATE codes SET used_count = used_count + 1 WHERE id = ?', (code_id,))
-            cursor.execute('UPDATE users SET points = points + ? WHERE id = ?', (points, user_id))
-            
+
+            points = claimed[0]
+            cursor.execute(_SQL_AWARD_POINTS, (points, user_id))
+
             conn.commit()
+            self._invalidate_stats_cache()
             return points
-        
+
         except Exception as e:
+            conn.rollback()
             logging.error(f"Error redeeming code: {e}")
             return None
     
+    def _invalidate_stats_cache(self):
+        """Drop the cached stats after a write that changes the counts"""
+        self._stats_cache = (0.0, None)
+
     def get_stats(self) -> Dict[str, int]:
-        """Get bot statistics"""
+        """Get bot statistics (cached for STATS_CACHE_TTL seconds)"""
+        timestamp, cached = self._stats_cache
+        if cached is not None and time.monotonic() - timestamp < STATS_CACHE_TTL:
+            return cached
+
         conn = self.get_connection()
         cursor = conn.cursor()
-        
-        stats = {}
-        
-        # Total users
-        cursor.execute('SELECT COUNT(*) FROM users')
-        stats['users'] = cursor.fetchone()[0]
-        
-        # Active channels
-        cursor.execute('SELECT COUNT(*) FROM channels WHERE active = 1')
-        stats['channels'] = cursor.fetchone()[0]
-        
-        # Total points distributed
-        cursor.execute('SELECT SUM(points) FROM users')
-        stats['total_points'] = cursor.fetchone()[0] or 0
-        
-        # Active orders
-        cursor.execute('SELECT COUNT(*) FROM orders WHERE status = "active"')
-        stats['active_orders'] = cursor.fetchone()[0]
-        
+
+        # All four counts in one statement so the call costs a single
+        # round-trip instead of four
+        cursor.execute(_SQL_GET_STATS)
+        users, channels, total_points, active_orders = cursor.fetchone()
+        stats = {
+            'users': users,
+            'channels': channels,
+            'total_points': total_points,
+            'active_orders': active_orders,
+        }
+        self._stats_cache = (time.monotonic(), stats)
         return stats
     
-    def get_all_users(self) -> List[int]:
-        """Get all user IDs for broadcasting"""
+    def count_users(self, include_blocked: bool = False) -> int:
+        """Count users, optionally excluding those who blocked the bot"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        
-        cursor.execute('SELECT id FROM users')
-        return [row[0] for row in cursor.fetchall()]
 
-    def get_user_by_username(self, username: str) -> Dict:
+        if include_blocked:
+            cursor.execute('SELECT COUNT(*) FROM users')
+        else:
+            cursor.execute('SELECT COUNT(*) FROM users WHERE blocked = 0')
+        return cursor.fetchone()[0]
+
+    def iter_users(self, page_size: int = 5000):
+        """Yield pages of user IDs for broadcasting, skipping blocked users.
+
+        Uses keyset pagination (WHERE id > last_id) so each page stays cheap
+        as the users table grows, and only one page is held in memory.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        last_id = 0
+        while True:
+            cursor.execute('''
+                SELECT id FROM users
+                WHERE id > ? AND blocked = 0
+                ORDER BY id LIMIT ?
+            ''', (last_id, page_size))
+            page = [row[0] for row in cursor.fetchall()]
+            if not page:
+                return
+            last_id = page[-1]
+            yield page
+
+    def mark_users_blocked(self, user_ids: List[int]) -> bool:
+        """Mark users who blocked the bot so future broadcasts skip them"""
+        if not user_ids:
+            return True
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            placeholders = ','.join('?' * len(user_ids))
+            cursor.execute(f'UPDATE users SET blocked = 1 WHERE id IN ({placeholders})', user_ids)
+            conn.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Error marking users blocked: {e}")
+            return False
+
+    def get_user_by_username(self, username: str) -> Optional[Dict]:
         """Get user information by username"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         # Remove @ if present
-        username = username.replace('@', '')
+        username = _strip_at(username)
         cursor.execute('SELECT * FROM users WHERE username = ? COLLATE NOCASE', (username,))
         result = cursor.fetchone()
         return dict(result) if result else None
-    
+
+    def get_user_full_profile(self, username: str) -> Optional[Dict]:
+        """Get user info, ban details and subscribed channels in one query"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        # Remove @ if present
+        username = _strip_at(username)
+
+        try:
+            cursor.execute('''
+                SELECT u.*,
+                       (SELECT GROUP_CONCAT(channel_username)
+                        FROM user_channel_subscriptions
+                        WHERE user_id = u.id) AS subscribed_channels
+                FROM users u
+                WHERE u.username = ? COLLATE NOCASE
+            ''', (username,))
+
+            result = cursor.fetchone()
+            if not result:
+                return None
+
+            profile = dict(result)
+            subscribed = profile.pop('subscribed_channels')
+            profile['subscriptions'] = subscribed.split(',') if subscribed else []
+            return profile
+        except Exception as e:
+            logging.error(f"Error getting full profile for user {username}: {e}")
+            return None
+
     # Mandatory channels management
     def add_mandatory_channel(self, channel_username: str, channel_title: str = None, channel_link: str = None):
         """Add a mandatory channel"""
@@ -909,7 +1559,7 @@ class Database:
             cursor.execute('''
                 INSERT OR REPLACE INTO mandatory_channels (channel_username, channel_title, channel_link)
                 VALUES (?, ?, ?)
-            ''', (channel_username.replace('@', ''), channel_title, channel_link))
+            ''', (_strip_at(channel_username), channel_title, channel_link))
             conn.commit()
             return cursor.rowcount > 0
         except Exception as e:
@@ -923,7 +1573,7 @@ class Database:
         
         try:
             cursor.execute('DELETE FROM mandatory_channels WHERE channel_username = ?', 
-                         (channel_username.replace('@', ''),))
+                         (_strip_at(channel_username),))
             conn.commit()
             return cursor.rowcount > 0
         except Exception as e:
@@ -936,19 +1586,12 @@ class Database:
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM mandatory_channels WHERE active = 1 ORDER BY added_at')
-        results = cursor.fetchall()
-        return [dict(row) for row in results]
+        return self._rows_to_dicts(cursor)
     
     def check_user_mandatory_subscriptions(self, user_id: int):
         """Check which mandatory channels user is not subscribed to"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT mc.channel_username, mc.channel_title, mc.channel_link
-            FROM mandatory_channels mc
-            LEFT JOIN user_channel_subscriptions ucs ON mc.channel_username = ucs.channel_username AND ucs.user_id = ?
-            WHERE mc.active = 1 AND ucs.id IS NULL
-        ''', (user_id,))
-        results = cursor.fetchall()
-        return [dict(row) for row in results]
+        cursor.execute(_SQL_MISSING_MANDATORY, (user_id,))
+        return self._rows_to_dicts(cursor)
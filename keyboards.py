@@ -1,9 +1,11 @@
+from functools import lru_cache
+
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from config import SHOP_PRICES
+from config import SHOP_TIERS
 
-def main_keyboard():
-    """Main menu keyboard"""
-    keyboard = [
+# The static user-facing menus never change at runtime either; built
+# once at import time like the admin keyboards below
+_MAIN_KEYBOARD = InlineKeyboardMarkup([
         [InlineKeyboardButton("📊 حسابي", callback_data="account"),
          InlineKeyboardButton("🎁 هديتي اليومية", callback_data="daily_reward")],
         [InlineKeyboardButton("🧑‍🤝‍🧑 دعوة أصدقاء", callback_data="referral"),
@@ -11,61 +13,57 @@ def main_keyboard():
         [InlineKeyboardButton("⭐ قنوات VIP", callback_data="vip_channels"),
          InlineKeyboardButton("🛒 المتجر", callback_data="shop")],
         [InlineKeyboardButton("🎟️ استخدام كود", callback_data="redeem_code")]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+])
+
+_SHOP_KEYBOARD = InlineKeyboardMarkup(
+    [[InlineKeyboardButton(f"{members} أعضاء - {points} نقطة", callback_data=f"buy_{members}")]
+     for members, points in SHOP_TIERS]
+    + [[InlineKeyboardButton("🔙 العودة", callback_data="back_to_main")]]
+)
+
+_BACK_KEYBOARD = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 العودة", callback_data="back_to_main")]])
+
+def main_keyboard():
+    """Main menu keyboard"""
+    return _MAIN_KEYBOARD
 
 def shop_keyboard():
     """Shop menu keyboard"""
-    keyboard = []
-    for members, points in SHOP_PRICES.items():
-        keyboard.append([InlineKeyboardButton(
-            f"{members} أعضاء - {points} نقطة", 
-            callback_data=f"buy_{members}"
-        )])
+    return _SHOP_KEYBOARD
+
+def _channel_list_keyboard(channels, user_subscriptions, points, default_icon, refresh_callback):
+    """Shared builder for the channel list keyboards
+
+    One comprehension per list and a frozenset for the subscription
+    lookups, so each row costs an O(1) membership test instead of a
+    list scan.
+    """
+    subscribed = frozenset(user_subscriptions or ())
+    keyboard = [
+        [InlineKeyboardButton(
+            f"{'✅' if channel['username'] in subscribed else default_icon} "
+            f"@{channel['username']} ({channel['gained']}/{channel['target']}) - {points} نقاط",
+            callback_data=f"join_{channel['username']}"
+        )]
+        for channel in channels
+    ]
+    keyboard.append([InlineKeyboardButton("🔄 تحديث", callback_data=refresh_callback)])
     keyboard.append([InlineKeyboardButton("🔙 العودة", callback_data="back_to_main")])
     return InlineKeyboardMarkup(keyboard)
 
 def channels_keyboard(channels, user_subscriptions=None):
     """Normal channels list keyboard with status indicators"""
-    keyboard = []
-    user_subscriptions = user_subscriptions or []
-    
-    for channel in channels:
-        points = 3  # Normal channels = 3 points
-        status_icon = "✅" if channel['username'] in user_subscriptions else "📢"
-        progress = f"{channel['gained']}/{channel['target']}"
-        
-        keyboard.append([InlineKeyboardButton(
-            f"{status_icon} @{channel['username']} ({progress}) - {points} نقاط",
-            callback_data=f"join_{channel['username']}"
-        )])
-    
-    keyboard.append([InlineKeyboardButton("🔄 تحديث", callback_data="refresh_channels")])
-    keyboard.append([InlineKeyboardButton("🔙 العودة", callback_data="back_to_main")])
-    return InlineKeyboardMarkup(keyboard)
+    # Normal channels = 3 points
+    return _channel_list_keyboard(channels, user_subscriptions, 3, "📢", "refresh_channels")
 
 def vip_channels_keyboard(channels, user_subscriptions=None):
     """VIP channels list keyboard with status indicators"""
-    keyboard = []
-    user_subscriptions = user_subscriptions or []
-    
-    for channel in channels:
-        points = 4  # VIP channels = 4 points
-        status_icon = "✅" if channel['username'] in user_subscriptions else "⭐"
-        progress = f"{channel['gained']}/{channel['target']}"
-        
-        keyboard.append([InlineKeyboardButton(
-            f"{status_icon} @{channel['username']} ({progress}) - {points} نقاط",
-            callback_data=f"join_{channel['username']}"
-        )])
-    
-    keyboard.append([InlineKeyboardButton("🔄 تحديث", callback_data="refresh_vip_channels")])
-    keyboard.append([InlineKeyboardButton("🔙 العودة", callback_data="back_to_main")])
-    return InlineKeyboardMarkup(keyboard)
+    # VIP channels = 4 points
+    return _channel_list_keyboard(channels, user_subscriptions, 4, "⭐", "refresh_vip_channels")
 
-def admin_keyboard():
-    """Admin menu keyboard"""
-    keyboard = [
+# Admin keyboards never change, so build them once at import time and
+# hand out the same immutable markup on every call
+_ADMIN_KEYBOARD = InlineKeyboardMarkup([
         [InlineKeyboardButton("👥 إدارة المستخدمين", callback_data="admin_users"),
          InlineKeyboardButton("📢 إدارة القنوات", callback_data="admin_channels")],
         [InlineKeyboardButton("📦 الطلبات", callback_data="admin_orders"),
@@ -83,19 +81,29 @@ def admin_keyboard():
         [InlineKeyboardButton("✅ إلغاء حظر", callback_data="admin_unban_user"),
          InlineKeyboardButton("➕ إضافة قناة إجبارية", callback_data="admin_add_mandatory")],
         [InlineKeyboardButton("➖ حذف قناة إجبارية", callback_data="admin_remove_mandatory")]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+])
+
+_ADMIN_BACK_KEYBOARD = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 العودة", callback_data="admin_menu")]])
+
+def admin_keyboard():
+    """Admin menu keyboard"""
+    return _ADMIN_KEYBOARD
 
 def back_keyboard():
     """Simple back button"""
-    return InlineKeyboardMarkup([[InlineKeyboardButton("🔙 العودة", callback_data="back_to_main")]])
+    return _BACK_KEYBOARD
 
 def admin_back_keyboard():
     """Back to admin menu"""
-    return InlineKeyboardMarkup([[InlineKeyboardButton("🔙 العودة", callback_data="admin_menu")]])
+    return _ADMIN_BACK_KEYBOARD
 
+@lru_cache(maxsize=256)
 def confirmation_keyboard(action, data):
-    """Confirmation keyboard for actions"""
+    """Confirmation keyboard for actions
+
+    The same (action, data) pairs recur — e.g. one per shop tier — so
+    the markup is memoized instead of rebuilt per click.
+    """
     keyboard = [
         [InlineKeyboardButton("✅ تأكيد", callback_data=f"confirm_{action}_{data}"),
          InlineKeyboardButton("❌ إلغاء", callback_data="back_to_main")]
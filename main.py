@@ -8,24 +8,29 @@ import asyncio
 import logging
 from telegram import Update
 from telegram.ext import (
-    Application, 
-    CommandHandler, 
-    CallbackQueryHandler, 
-    MessageHandler, 
+    Application,
+    CommandHandler,
+    CallbackQueryHandler,
+    MessageHandler,
     filters
 )
+from telegram.request import HTTPXRequest
 # Removed APScheduler import - using built-in asyncio
 
 from database import Database
 from bot_handlers import BotHandlers
 from admin_handlers import AdminHandlers
-from config import BOT_TOKEN, ADMIN_ID
+from config import BOT_TOKEN, ADMIN_ID, ADMIN_IDS
 from utils import setup_logging
 
-# Setup logging
-setup_logging()
+# Setup logging; keep the listener alive so the log thread keeps draining
+_log_listener = setup_logging()
 logger = logging.getLogger(__name__)
 
+# Callback prefixes that route to the admin handlers; str.startswith
+# checks a tuple in one C call
+_ADMIN_PREFIXES = ('admin_', 'confirm_admin')
+
 async def error_handler(update: object, context) -> None:
     """Handle errors"""
     error_message = str(context.error)
@@ -63,7 +68,16 @@ async def post_init(application):
 
 def main():
     """Main function to run the bot"""
-    
+
+    # Pure I/O workload: libuv's event loop dispatches callbacks with
+    # less overhead than the default selector loop when available
+    try:
+        import uvloop
+        uvloop.install()
+        logger.info("Using uvloop event loop")
+    except ImportError:
+        pass
+
     # Initialize database
     logger.info("Initializing database...")
     db = Database('bot_database.db')
@@ -72,11 +86,18 @@ def main():
     bot_handlers = BotHandlers(db)
     admin_handlers = AdminHandlers(db)
     
-    # Create application
-    logger.info("Creating bot application...")
-    application = Application.builder().token(BOT_TOKEN).post_init(post_init).build()
-    
     # Setup periodic channel verification using asyncio
+    # Bounded so a large channel list overlaps its Telegram round-trips
+    # without flooding the API
+    check_semaphore = asyncio.Semaphore(8)
+
+    async def check_one_channel(channel):
+        """Check a single channel for leavers and update its member count"""
+        async with check_semaphore:
+            await bot_handlers._check_channel_leavers(application.bot, channel['username'])
+            # Update channel member count using smart bot-only counting
+            return channel['username'], db.update_channel_members(channel['username'])
+
     async def periodic_channel_check():
         """Periodically check all channels for leavers"""
         while True:
@@ -85,13 +106,18 @@ def main():
                 all_channels = db.get_active_channels()
                 completed_channels = []
                 completed_orders = []
-                for channel in all_channels:
-                    await bot_handlers._check_channel_leavers(application.bot, channel['username'])
-                    # Update channel member count using smart bot-only counting
-                    completed, order_owner_id = db.update_channel_members(channel['username'])
+                results = await asyncio.gather(
+                    *(check_one_channel(channel) for channel in all_channels),
+                    return_exceptions=True
+                )
+                for result in results:
+                    if isinstance(result, BaseException):
+                        logger.error("Channel check failed: %s", result)
+                        continue
+                    channel_username, (completed, order_owner_id) = result
                     if completed:
-                        completed_channels.append(channel['username'])
-                        completed_orders.append((channel['username'], order_owner_id))
+                        completed_channels.append(channel_username)
+                        completed_orders.append((channel_username, order_owner_id))
                 
                 # Notify admin and order owners of completed channels
                 if completed_channels:
@@ -102,19 +128,27 @@ def main():
                             chat_id=ADMIN_ID,
                             text=f"🎉 تم إكمال القنوات التالية:\n\n{channels_text}\n\n✅ تم إزالتها من التجميع تلقائياً"
                         )
-                        
-                        # Notify each order owner
-                        for channel_name, order_owner_id in completed_orders:
-                            if order_owner_id and order_owner_id != ADMIN_ID:
-                                try:
-                                    await application.bot.send_message(
-                                        chat_id=order_owner_id,
-                                        text=f"🎉 تهانينا! تم إكمال طلبك!\n\n📢 القناة: @{channel_name}\n✅ تم الوصول للعدد المطلوب من الأعضاء\n\n🙏 شكراً لاستخدام خدماتنا"
-                                    )
-                                except Exception as e:
-                                    logger.error(f"Failed to notify order owner {order_owner_id} for channel @{channel_name}: {e}")
                     except Exception as e:
                         logger.error(f"Failed to notify admin of completed channels: {e}")
+
+                    # Notify the order owners concurrently; each send
+                    # only waits on its own round-trip
+                    async def notify_owner(channel_name, order_owner_id):
+                        async with notify_semaphore:
+                            try:
+                                await application.bot.send_message(
+                                    chat_id=order_owner_id,
+                                    text=f"🎉 تهانينا! تم إكمال طلبك!\n\n📢 القناة: @{channel_name}\n✅ تم الوصول للعدد المطلوب من الأعضاء\n\n🙏 شكراً لاستخدام خدماتنا"
+                                )
+                            except Exception as e:
+                                logger.error(f"Failed to notify order owner {order_owner_id} for channel @{channel_name}: {e}")
+
+                    notify_semaphore = asyncio.Semaphore(20)
+                    await asyncio.gather(
+                        *(notify_owner(channel_name, order_owner_id)
+                          for channel_name, order_owner_id in completed_orders
+                          if order_owner_id and order_owner_id != ADMIN_ID)
+                    )
                 
                 logger.info(f"Completed periodic check for {len(all_channels)} channels ({len(completed_channels)} completed)")
             except Exception as e:
@@ -133,8 +167,20 @@ def main():
         await original_post_init(application)
         await start_periodic_tasks(application)
     
-    # Update the application with enhanced post_init
-    application = Application.builder().token(BOT_TOKEN).post_init(enhanced_post_init).build()
+    # Create application
+    logger.info("Creating bot application...")
+    # Larger connection pool so concurrent sends (broadcasts, notifications)
+    # reuse keep-alive connections instead of queueing on the default pool.
+    # getUpdates long-polling gets its own small pool so it never competes
+    # with outbound fan-outs for connections.
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .request(HTTPXRequest(connection_pool_size=64, read_timeout=10, pool_timeout=30))
+        .get_updates_request(HTTPXRequest(connection_pool_size=4, pool_timeout=30))
+        .post_init(enhanced_post_init)
+        .build()
+    )
     
     # Add command handlers
     application.add_handler(CommandHandler("start", bot_handlers.start))
@@ -154,12 +200,19 @@ def main():
     application.add_handler(CommandHandler("addmandatory", admin_handlers.add_mandatory_channel))
     application.add_handler(CommandHandler("removemandatory", admin_handlers.remove_mandatory_channel))
     application.add_handler(CommandHandler("userinfo", admin_handlers.get_user_info))
+    # PTB drops non-admin /addcontent updates before the coroutine runs
+    application.add_handler(CommandHandler(
+        "addcontent",
+        admin_handlers.add_special_content,
+        filters=filters.User(user_id=list(ADMIN_IDS))
+    ))
 
     
     # Callback query handlers
     async def callback_router(update: Update, context):
         """Route callback queries to appropriate handler"""
-        if update.callback_query and update.callback_query.data and update.callback_query.data.startswith(('admin_', 'confirm_admin')):
+        data = update.callback_query.data if update.callback_query else None
+        if data and data.startswith(_ADMIN_PREFIXES):
             await admin_handlers.handle_callback_query(update, context)
         else:
             await bot_handlers.handle_callback(update, context)
@@ -186,11 +239,16 @@ def main():
     print("📊 البوت جاهز لاستقبال المستخدمين...")
     
     # Run the bot
-    application.run_polling(
-        allowed_updates=Update.ALL_TYPES,
-        drop_pending_updates=True,
-        close_loop=False
-    )
+    try:
+        application.run_polling(
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=True,
+            close_loop=False
+        )
+    finally:
+        # run_polling has returned, so the to_thread workers are idle
+        # and every pooled connection can be closed safely
+        db.close()
 
 if __name__ == "__main__":
     try:
@@ -1,50 +1,100 @@
 import asyncio
+import re
 from telegram import Bot, User
 from telegram.error import TelegramError
 import logging
+import time
 
-async def check_user_legitimacy(bot: Bot, user: User) -> dict:
+# Compiled once: one C-level scan over the name instead of a Python
+# substring search per pattern
+_SUSPICIOUS_NAME_RE = re.compile(r'test|bot|123|fake|spam')
+
+# A user's legitimacy verdict barely changes; an hour of memoization
+# saves one get_user_profile_photos RPC per repeat check
+LEGITIMACY_CACHE_TTL = 3600
+_LEGITIMACY_CACHE_MAX = 10000
+_legitimacy_cache = {}  # user_id -> (timestamp, result dict)
+
+async def check_user_legitimacy(bot: Bot, user: User, fast: bool = False) -> dict:
     """
     Check if user appears to be legitimate or fake
     Returns dict with is_legitimate bool and warnings list
+
+    Local checks run first so an obviously fake name is rejected without
+    the profile-photo RPC; with fast=True a locally failed user returns
+    immediately and only locally clean users pay for the network call.
     """
+    entry = _legitimacy_cache.get(user.id)
+    if entry and time.monotonic() - entry[0] < LEGITIMACY_CACHE_TTL:
+        return entry[1]
+
     warnings = []
     is_legitimate = True
-    
+    verification_failed = False
+
+    # Check if first name exists and is reasonable
+    if not user.first_name or len(user.first_name.strip()) < 2:
+        warnings.append("اسم غير مناسب")
+        is_legitimate = False
+
+    # Check for suspicious patterns in name
+    if user.first_name and _SUSPICIOUS_NAME_RE.search(user.first_name.lower()):
+        warnings.append("اسم مشبوه")
+        is_legitimate = False
+
+    # Check if username exists (optional but good sign)
+    if not user.username:
+        warnings.append("لا يوجد معرف")
+        # Don't mark as illegitimate just for missing username
+
+    # Check user ID patterns (very new accounts might be suspicious)
+    if user.id > 6000000000:  # Very high ID numbers might indicate recent bot creation
+        warnings.append("حساب جديد جداً")
+
+    if fast and not is_legitimate:
+        # Already rejected locally; the photo check could only add
+        # warnings. Not cached so a full check later stays complete.
+        return {
+            'is_legitimate': False,
+            'warnings': warnings
+        }
+
     try:
         # Check if user has a profile photo
         photos = await bot.get_user_profile_photos(user.id, limit=1)
         if photos.total_count == 0:
             warnings.append("لا يوجد صورة شخصية")
             is_legitimate = False
-        
-        # Check if first name exists and is reasonable
-        if not user.first_name or len(user.first_name.strip()) < 2:
-            warnings.append("اسم غير مناسب")
-            is_legitimate = False
-        
-        # Check for suspicious patterns in name
-        suspicious_patterns = ['test', 'bot', '123', 'fake', 'spam']
-        name_lower = user.first_name.lower() if user.first_name else ""
-        if any(pattern in name_lower for pattern in suspicious_patterns):
-            warnings.append("اسم مشبوه")
-            is_legitimate = False
-        
-        # Check if username exists (optional but good sign)
-        if not user.username:
-            warnings.append("لا يوجد معرف")
-            # Don't mark as illegitimate just for missing username
-        
-        # Check user ID patterns (very new accounts might be suspicious)
-        if user.id > 6000000000:  # Very high ID numbers might indicate recent bot creation
-            warnings.append("حساب جديد جداً")
-        
+
     except TelegramError as e:
         logging.error(f"Error checking user legitimacy: {e}")
         warnings.append("خطأ في التحقق")
         is_legitimate = False
-    
-    return {
+        verification_failed = True
+
+    result = {
         'is_legitimate': is_legitimate,
         'warnings': warnings
-    }
\ No newline at end of file
+    }
+    # API failures are not cached so a transient error does not stick
+    # to the user for an hour
+    if not verification_failed:
+        if len(_legitimacy_cache) >= _LEGITIMACY_CACHE_MAX:
+            _legitimacy_cache.clear()
+        _legitimacy_cache[user.id] = (time.monotonic(), result)
+    return result
+
+async def check_users_legitimacy(bot: Bot, users: list, concurrency: int = 20) -> list:
+    """Check several users at once with bounded concurrent API calls
+
+    Results come back in the same order as the input. The semaphore
+    keeps the profile-photo lookups from flooding the API when a whole
+    channel's worth of users is checked in one sweep.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check_one(user):
+        async with semaphore:
+            return await check_user_legitimacy(bot, user)
+
+    return await asyncio.gather(*(check_one(user) for user in users))
\ No newline at end of file
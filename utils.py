@@ -1,47 +1,123 @@
+import asyncio
 import logging
+import logging.handlers
+import queue
 import re
+import time
+from functools import lru_cache
 from typing import Optional
 from telegram import Bot
 from telegram.error import TelegramError
 
+# Short-lived memoization for membership probes: the same (user, channel)
+# pair is often checked several times within seconds (list + refresh + join)
+MEMBERSHIP_CACHE_TTL = 10
+_MEMBERSHIP_CACHE_MAX = 50000
+_membership_cache = {}  # (user_id, channel_username) -> (timestamp, is_member)
+
+# Member counts drift slowly; a minute of staleness is fine for the
+# confirmation screens that display them
+MEMBER_COUNT_CACHE_TTL = 60
+_MEMBER_COUNT_CACHE_MAX = 1024
+_member_count_cache = {}  # channel_username -> (timestamp, count)
+
+# Statuses that count as being in the channel; a shared frozenset makes
+# each check a hash probe with no per-call list literal
+_VALID_MEMBER_STATUSES = frozenset(('member', 'administrator', 'creator'))
+
+# Suspicion flags for check_user_membership: the checks set bits and the
+# warning strings are only materialized when something actually flagged
+_SUSPICION_WARNINGS = (
+    (1, "username too short"),
+    (2, "username is all numbers"),
+    (4, "no username"),
+    (8, "no proper first name"),
+    (16, "potentially new account"),
+)
+# Bits that mark the account as suspicious (missing username and a very
+# new account are logged but not held against the user)
+_SUSPICIOUS_MASK = 1 | 2 | 8
+
+# Compiled once: handle_message validates every candidate channel name
+# Format: 5-32 characters, letters, digits, underscores, letter first
+_CHANNEL_USERNAME_RE = re.compile(r'[a-zA-Z][a-zA-Z0-9_]{4,31}')
+
+@lru_cache(maxsize=4096)
+def _at(username: str) -> str:
+    """Memoized @-prefixed form of a channel username
+
+    The same channel names are prefixed over and over by the membership
+    probes; caching turns N allocations per sweep into dictionary hits.
+    """
+    return f"@{username}"
+
 def setup_logging():
-    """Setup logging configuration"""
-    logging.basicConfig(
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        level=logging.INFO,
-        handlers=[
-            logging.FileHandler('bot.log'),
-            logging.StreamHandler()
-        ]
+    """Setup logging configuration
+
+    Log records go through a queue: emitting costs an enqueue on the
+    event-loop thread while a listener thread does the actual file and
+    console writes, so disk latency never blocks a handler coroutine.
+    Returns the listener so the caller can keep it (and stop() it on a
+    clean shutdown).
+    """
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler('bot.log')
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True
     )
+    listener.start()
+    return listener
 
 def extract_user_id_from_start(text: str) -> Optional[int]:
     """Extract referrer user ID from /start command"""
     if not text.startswith('/start'):
         return None
-    
-    parts = text.split()
-    if len(parts) > 1:
-        try:
-            return int(parts[1])
-        except ValueError:
-            return None
-    return None
+
+    # Only the token after the command matters; partition + a bounded
+    # split avoids tokenizing the whole message
+    _, sep, rest = text.partition(' ')
+    if not sep:
+        return None
+
+    tokens = rest.split(None, 1)
+    if not tokens:
+        return None
+    try:
+        return int(tokens[0])
+    except ValueError:
+        return None
 
 def is_valid_channel_username(username: str) -> bool:
     """Validate channel username format"""
     if not username:
         return False
-    
-    # Remove @ if present
-    username = username.replace('@', '')
-    
-    # Check format: 5-32 characters, letters, digits, underscores
-    pattern = r'^[a-zA-Z][a-zA-Z0-9_]{4,31}$'
-    return bool(re.match(pattern, username))
 
+    # Remove leading @ if present
+    if username.startswith('@'):
+        username = username[1:]
+
+    return _CHANNEL_USERNAME_RE.fullmatch(username) is not None
+
+@lru_cache(maxsize=1024)
 def format_number(number: int) -> str:
-    """Format number with Arabic thousand separators"""
+    """Format number with Arabic thousand separators
+
+    Small numbers (the overwhelming majority of points/referral counts)
+    return without any separator work, and repeated values — every
+    template render calls this several times — come straight from the
+    cache.
+    """
+    if -1000 < number < 1000:
+        return str(number)
     return f"{number:,}".replace(',', '٬')
 
 def validate_points_amount(amount_str: str) -> Optional[int]:
@@ -57,10 +133,10 @@ def validate_points_amount(amount_str: str) -> Optional[int]:
 async def check_user_membership(bot: Bot, user_id: int, channel_username: str) -> bool:
     """Check if user is a real member of the channel (not fake/bot account)"""
     try:
-        member = await bot.get_chat_member(chat_id=f"@{channel_username}", user_id=user_id)
+        member = await bot.get_chat_member(chat_id=_at(channel_username), user_id=user_id)
         
         # Check if user is actually a member
-        if member.status not in ['member', 'administrator', 'creator']:
+        if member.status not in _VALID_MEMBER_STATUSES:
             return False
             
         # Additional verification: Check if user account appears legitimate
@@ -68,63 +144,85 @@ async def check_user_membership(bot: Bot, user_id: int, channel_username: str) -
         
         # Basic checks for fake accounts
         if user.is_bot:
-            logging.warning(f"Bot account detected trying to join @{channel_username}: {user_id}")
+            logging.warning("Bot account detected trying to join @%s: %s", channel_username, user_id)
             return False
             
-        # Advanced verification for fake accounts
-        is_suspicious = False
-        warnings = []
-        
-        # Check for suspicious username patterns
-        if user.username:
-            if len(user.username) < 5:
-                warnings.append("username too short")
-                is_suspicious = True
-            # Check for bot-like patterns (numbers only, random chars)
-            if user.username.isdigit():
-                warnings.append("username is all numbers")
-                is_suspicious = True
-        else:
-            warnings.append("no username")
-            
-        # Check if user has first name (fake accounts often don't)
-        if not user.first_name or len(user.first_name.strip()) < 2:
-            warnings.append("no proper first name")
-            is_suspicious = True
-            
-        # Check for recently created accounts (if possible through user ID patterns)
-        if user_id > 6000000000:  # Recently created accounts tend to have high IDs
-            warnings.append("potentially new account")
-            
+        # Advanced verification for fake accounts: one flags integer
+        # instead of a warnings list; the clean path builds no strings
+        uname = user.username or ''
+        flags = (
+            # Suspicious username patterns (too short / numbers only)
+            (1 if uname and len(uname) < 5 else 0)
+            | (2 if uname and uname.isdigit() else 0)
+            | (4 if not uname else 0)
+            # Fake accounts often have no proper first name
+            | (8 if not user.first_name or len(user.first_name.strip()) < 2 else 0)
+            # Recently created accounts tend to have high IDs
+            | (16 if user_id > 6000000000 else 0)
+        )
+
         # Log verification results
-        if is_suspicious:
-            logging.warning(f"⚠️ Suspicious account @{user.username or 'no_username'} ({user_id}) in @{channel_username}: {', '.join(warnings)}")
+        if flags & _SUSPICIOUS_MASK:
+            logging.warning("⚠️ Suspicious account @%s (%s) in @%s: %s",
+                            uname or 'no_username', user_id, channel_username,
+                            ', '.join(w for bit, w in _SUSPICION_WARNINGS if flags & bit))
         else:
-            logging.info(f"✅ Verified legitimate user {user_id} (@{user.username or 'no_username'}) in @{channel_username}")
-            
+            logging.info("✅ Verified legitimate user %s (@%s) in @%s", user_id, uname or 'no_username', channel_username)
+
         # Allow user but log concerns (you can make this stricter if needed)
         return True
         
     except TelegramError as e:
-        logging.error(f"Error checking membership for @{channel_username}: {e}")
+        logging.error("Error checking membership for @%s: %s", channel_username, e)
         return False
 
+async def check_user_membership_cached(bot: Bot, user_id: int, channel_username: str) -> bool:
+    """check_user_membership behind a short TTL to collapse duplicate probes"""
+    key = (user_id, channel_username)
+    entry = _membership_cache.get(key)
+    if entry and time.monotonic() - entry[0] < MEMBERSHIP_CACHE_TTL:
+        return entry[1]
+
+    is_member = await check_user_membership(bot, user_id, channel_username)
+    if len(_membership_cache) >= _MEMBERSHIP_CACHE_MAX:
+        _membership_cache.clear()
+    _membership_cache[key] = (time.monotonic(), is_member)
+    return is_member
+
+def invalidate_membership(user_id: int, channel_username: str):
+    """Drop a cached probe result after a join or penalty changes it"""
+    _membership_cache.pop((user_id, channel_username.replace('@', '')), None)
+
 async def get_channel_member_count(bot: Bot, channel_username: str) -> int:
-    """Get the current member count of a channel"""
+    """Get the current member count of a channel
+
+    Uses the dedicated getChatMemberCount endpoint, which returns a bare
+    integer instead of the full Chat object getChat decodes, so there is
+    no per-call attribute probing either.
+    """
     try:
-        chat = await bot.get_chat(chat_id=f"@{channel_username}")
-        # Handle different API response formats
-        if hasattr(chat, 'member_count'):
-            return chat.member_count or 0
-        elif hasattr(chat, 'members_count'):
-            return chat.members_count or 0
-        else:
-            # Fallback: try to get chat administrators count as approximation
-            return 1
+        return await bot.get_chat_member_count(chat_id=_at(channel_username)) or 0
     except TelegramError as e:
-        logging.error(f"Error getting member count for @{channel_username}: {e}")
+        logging.error("Error getting member count for @%s: %s", channel_username, e)
         return 0
 
+async def get_channel_member_count_cached(bot: Bot, channel_username: str) -> int:
+    """get_channel_member_count behind a short TTL
+
+    Failed lookups (count 0) are not cached so a retry after fixing the
+    bot's admin rights works immediately.
+    """
+    entry = _member_count_cache.get(channel_username)
+    if entry and time.monotonic() - entry[0] < MEMBER_COUNT_CACHE_TTL:
+        return entry[1]
+
+    count = await get_channel_member_count(bot, channel_username)
+    if count:
+        if len(_member_count_cache) >= _MEMBER_COUNT_CACHE_MAX:
+            _member_count_cache.clear()
+        _member_count_cache[channel_username] = (time.monotonic(), count)
+    return count
+
 def parse_admin_command(text: str) -> tuple:
     """Parse admin command and return command parts"""
     parts = text.split()
@@ -140,68 +238,160 @@ def generate_referral_link(bot_username: str, user_id: int) -> str:
     return f"https://t.me/{bot_username}?start={user_id}"
 
 async def check_channel_membership_simple(bot, user_id: int, channel_username: str) -> bool:
-    """Simple check if user is a member of the channel - Works without admin permissions"""
+    """Simple check if user is a member of the channel - Works without admin permissions
+
+    Positive results go through the shared membership cache so bursts of
+    users re-validating the same mandatory channels collapse to one API
+    call per window; negatives are never cached, so a user who just
+    joined passes the very next check.
+    """
+    key = (user_id, channel_username)
+    entry = _membership_cache.get(key)
+    if entry and entry[1] and time.monotonic() - entry[0] < MEMBERSHIP_CACHE_TTL:
+        return True
+
     try:
-        member = await bot.get_chat_member(f"@{channel_username}", user_id)
+        member = await bot.get_chat_member(_at(channel_username), user_id)
         # Check if user is a member (not kicked, left, or restricted)
-        return member.status in ['member', 'administrator', 'creator']
+        is_member = member.status in _VALID_MEMBER_STATUSES
     except Exception as e:
-        logging.error(f"Error checking membership for @{channel_username}: {e}")
+        logging.error("Error checking membership for @%s: %s", channel_username, e)
         # If we can't check, assume they're not a member
         return False
 
+    if is_member:
+        if len(_membership_cache) >= _MEMBERSHIP_CACHE_MAX:
+            _membership_cache.clear()
+        _membership_cache[key] = (time.monotonic(), True)
+    return is_member
+
 async def check_mandatory_channels_membership(bot, user_id: int, mandatory_channels: list) -> tuple:
-    """Check membership in mandatory channels and return missing ones"""
-    missing_channels = []
-    
-    for channel in mandatory_channels:
-        is_member = await check_channel_membership_simple(bot, user_id, channel['channel_username'])
-        if not is_member:
-            missing_channels.append(channel)
-    
+    """Check membership in mandatory channels and return missing ones
+
+    All channels are probed concurrently, so the check costs one Telegram
+    round-trip instead of one per channel; the semaphore caps in-flight
+    probes so a long mandatory list cannot trigger 429 floods.
+    """
+    semaphore = asyncio.Semaphore(10)
+
+    async def probe(channel_username):
+        async with semaphore:
+            return await check_channel_membership_simple(bot, user_id, channel_username)
+
+    results = await asyncio.gather(
+        *[probe(channel['channel_username']) for channel in mandatory_channels],
+        return_exceptions=True
+    )
+
+    missing_channels = [
+        channel for channel, is_member in zip(mandatory_channels, results)
+        if isinstance(is_member, Exception) or not is_member
+    ]
+
     return len(missing_channels) == 0, missing_channels
 
+async def first_missing_channel(bot, user_id: int, mandatory_channels: list):
+    """Return the first mandatory channel the user is missing, or None
+
+    Short-circuit variant of check_mandatory_channels_membership for
+    callers that only gate on membership: probes run concurrently but
+    the loop stops at the first non-member and cancels the rest, so a
+    long mandatory list costs one failed round-trip instead of all of
+    them. API errors count as missing, matching the full-list variant.
+    """
+    if not mandatory_channels:
+        return None
+
+    semaphore = asyncio.Semaphore(10)
+
+    async def probe(channel):
+        async with semaphore:
+            try:
+                is_member = await check_channel_membership_simple(
+                    bot, user_id, channel['channel_username'])
+            except Exception:
+                is_member = False
+            return channel, is_member
+
+    # as_completed yields its own wrapper futures, not the tasks that
+    # were passed in, so each probe carries its channel in the result
+    tasks = [asyncio.ensure_future(probe(channel)) for channel in mandatory_channels]
+    try:
+        for future in asyncio.as_completed(tasks):
+            channel, is_member = await future
+            if not is_member:
+                return channel
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+# Escape table built once; str.translate then escapes all 18 specials
+# in a single C-level pass instead of one full-string replace per char
+_MARKDOWN_ESCAPE_TABLE = str.maketrans({c: f'\\{c}' for c in '_*[]()~`>#+-=|{}.!'})
+
 def escape_markdown(text: str) -> str:
     """Escape markdown special characters"""
-    escape_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-    for char in escape_chars:
-        text = text.replace(char, f'\\{char}')
-    return text
+    return text.translate(_MARKDOWN_ESCAPE_TABLE)
+
+# Static skeletons of the templated messages, parsed once at import;
+# the methods below only substitute the dynamic fields
+_USER_STATS_TMPL = (
+    "📊 معلومات حسابك:\n\n"
+    "💰 النقاط: %s\n"
+    "👥 الإحالات: %s\n"
+    "📢 القنوات المنضم إليها: %s\n"
+    "📅 تاريخ التسجيل: %s"
+)
+
+_ORDER_CONFIRMATION_TMPL = (
+    "✅ تم إنشاء طلبك بنجاح!\n\n"
+    "📢 القناة: @%s\n"
+    "👥 الأعضاء المطلوبين: %s\n"
+    "💰 النقاط المخصومة: %s\n\n"
+    "سيتم إضافة قناتك إلى قائمة التجميع وإزالتها تلقائياً عند اكتمال العدد المطلوب."
+)
+
+_STATUS_EMOJI = {'active': '🟢', 'completed': '✅'}
+
+_ADMIN_STATS_TMPL = (
+    "📊 إحصائيات البوت:\n\n"
+    "👥 إجمالي المستخدمين: %s\n"
+    "📢 القنوات النشطة: %s\n"
+    "💰 إجمالي النقاط الموزعة: %s\n"
+    "📦 الطلبات النشطة: %s"
+)
 
 class MessageTemplates:
     """Pre-formatted message templates"""
-    
+
     @staticmethod
     def user_stats(user_data: dict) -> str:
         """Format user statistics message"""
-        return (
-            f"📊 معلومات حسابك:\n\n"
-            f"💰 النقاط: {format_number(user_data['points'])}\n"
-            f"👥 الإحالات: {format_number(user_data['referrals'])}\n"
-            f"📢 القنوات المنضم إليها: {format_number(user_data['channels_joined'])}\n"
-            f"📅 تاريخ التسجيل: {user_data['created_at'][:10]}"
+        return _USER_STATS_TMPL % (
+            format_number(user_data['points']),
+            format_number(user_data['referrals']),
+            format_number(user_data['channels_joined']),
+            user_data['created_at'][:10],
         )
-    
+
     @staticmethod
     def order_confirmation(channel_username: str, members: int, points: int) -> str:
         """Format order confirmation message"""
-        return (
-            f"✅ تم إنشاء طلبك بنجاح!\n\n"
-            f"📢 القناة: @{channel_username}\n"
-            f"👥 الأعضاء المطلوبين: {format_number(members)}\n"
-            f"💰 النقاط المخصومة: {format_number(points)}\n\n"
-            f"سيتم إضافة قناتك إلى قائمة التجميع وإزالتها تلقائياً عند اكتمال العدد المطلوب."
+        return _ORDER_CONFIRMATION_TMPL % (
+            channel_username,
+            format_number(members),
+            format_number(points),
         )
-    
+
     @staticmethod
     def admin_stats(stats: dict) -> str:
         """Format admin statistics message"""
-        return (
-            f"📊 إحصائيات البوت:\n\n"
-            f"👥 إجمالي المستخدمين: {format_number(stats['users'])}\n"
-            f"📢 القنوات النشطة: {format_number(stats['channels'])}\n"
-            f"💰 إجمالي النقاط الموزعة: {format_number(stats['total_points'])}\n"
-            f"📦 الطلبات النشطة: {format_number(stats['active_orders'])}"
+        return _ADMIN_STATS_TMPL % (
+            format_number(stats['users']),
+            format_number(stats['channels']),
+            format_number(stats['total_points']),
+            format_number(stats['active_orders']),
         )
     
     @staticmethod
@@ -209,19 +399,19 @@ class MessageTemplates:
         """Format orders list for admin"""
         if not orders:
             return "📦 لا توجد طلبات حالياً"
-        
-        message = "📦 قائمة الطلبات:\n\n"
+
+        parts = ["📦 قائمة الطلبات:\n\n"]
         for order in orders[:10]:  # Show only first 10
-            status_emoji = "🟢" if order['status'] == 'active' else "✅" if order['status'] == 'completed' else "❌"
+            status_emoji = _STATUS_EMOJI.get(order['status'], "❌")
             user_name = order.get('username', 'غير معروف')
-            message += (
+            parts.append(
                 f"{status_emoji} @{order['channel_username']}\n"
                 f"👤 {user_name} ({order['user_id']})\n"
                 f"👥 {order['members_count']} عضو\n"
                 f"📅 {order['created_at'][:16]}\n\n"
             )
-        
+
         if len(orders) > 10:
-            message += f"... و {len(orders) - 10} طلب آخر"
-        
-        return message
+            parts.append(f"... و {len(orders) - 10} طلب آخر")
+
+        return ''.join(parts)